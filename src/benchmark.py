@@ -0,0 +1,693 @@
+"""
+Offline benchmark for the Ali VOD -> S3 transfer pipeline.
+
+Runs the real code paths in utils.py against local stand-ins:
+  - a local HTTP server serving synthetic videos (and the valid-ids API),
+  - a fake AcsClient answering GetVideoList / GetMezzanineInfo,
+  - moto for S3, DynamoDB, SNS and SQS.
+
+Usage:
+    python benchmark.py --catalogue small
+    python benchmark.py --catalogue medium --save-baseline
+    python benchmark.py --catalogue medium --compare
+    python benchmark.py --catalogue medium --compare --repeats 5
+"""
+import argparse
+import contextlib
+import copy
+import json
+import logging
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Standard catalogue sizes: number of videos and size of each video in MB
+STANDARD_CATALOGUES = {
+    "small": {"videos": 50, "video_mb": 2},
+    "medium": {"videos": 500, "video_mb": 2},
+    "large": {"videos": 5000, "video_mb": 1},
+}
+
+BASELINE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks", "baselines")
+BENCH_REGION = "ap-southeast-2"
+SERVER_CHUNK_SIZE = 64 * 1024
+
+# --compare gates on the best of BENCH_REPEATS runs: throughput and p50 latencies only
+BENCH_REPEATS = 3
+COMPARE_MIN_SAMPLES = 20     # Latency checks with fewer samples (e.g. a single list page) are not gated
+COMPARE_MICRO_MS = 5.0       # p50 latencies below this use the micro-timing tolerance
+PREP_MIN_RECORDS = 20000     # The preparation benchmark repeats until it has timed at least this many records
+
+# utils constants that shape the S3 upload strategy (see choose_upload_config)
+UPLOAD_SETTINGS = (
+    "S3_SINGLE_PUT_MAX_MB",
+    "S3_MULTIPART_CHUNK_MB",
+    "S3_UPLOAD_BANDWIDTH_MB_PER_S",
+    "S3_PER_CONNECTION_MB_PER_S",
+)
+
+
+def build_catalogue(video_count, video_mb, duplicate_every=0):
+    """
+    Build a synthetic Aliyun catalogue shaped like the GetVideoList response.
+    With `duplicate_every` = N, every Nth video is a re-upload of the video before it.
+
+    Returns:
+        dict: VideoId -> video metadata dict.
+    """
+    catalogue = {}
+    base_time = datetime(2020, 1, 1)
+    for index in range(video_count):
+        video_id = f"bench{index:06d}"
+        created = base_time + timedelta(minutes=index)
+        catalogue[video_id] = {
+            "VideoId": video_id,
+            "Title": f"Lecture {index} - Week {index % 12}",
+            "CreateTime": created.strftime("%Y-%m-%d %H:%M:%S"),
+            "CreationTime": created.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "ModifyTime": created.strftime("%Y-%m-%d %H:%M:%S"),
+            "Size": int(video_mb * 1024 * 1024),
+            "Duration": 3600,
+            "CateId": 1000,
+            "CateName": "production",
+            "AppId": "app-1000000",
+            "Status": "Normal",
+            "CoverURL": f"https://cover.example.com/{video_id}.jpg",
+            "StorageLocation": "outin-bench.oss-ap-southeast-1.aliyuncs.com",
+            "Snapshots": {"Snapshot": [f"https://snap.example.com/{video_id}/{n}.jpg" for n in range(4)]},
+        }
+        if duplicate_every and index % duplicate_every == duplicate_every - 1 and index:
+            catalogue[video_id]["Title"] = catalogue[f"bench{index - 1:06d}"]["Title"]
+    return catalogue
+
+
+class SyntheticVideoServer:
+    """
+    Local HTTP server serving synthetic videos and the valid-ids API.
+
+    GET /videos/<video_id>.mp4   -> `video_bytes` of payload after `latency` seconds
+    GET /valid-ids?page=&limit=  -> paged {"docs": [...], "hasNextPage": bool}
+    """
+
+    def __init__(self, video_ids, video_bytes, latency=0.0):
+        self.video_ids = list(video_ids)
+        self.video_bytes = video_bytes
+        self.latency = latency
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_port}"
+
+    def video_url(self, video_id):
+        return f"{self.base_url}/videos/{video_id}.mp4"
+
+    def _make_handler(self):
+        server = self
+        payload = bytes(range(256)) * (SERVER_CHUNK_SIZE // 256)
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                if server.latency:
+                    time.sleep(server.latency)
+                if parsed.path == "/valid-ids":
+                    self._send_valid_ids(parse_qs(parsed.query))
+                elif parsed.path.startswith("/videos/"):
+                    self._send_video()
+                else:
+                    self.send_error(404)
+
+            def _send_valid_ids(self, query):
+                page = int(query.get("page", ["1"])[0])
+                limit = int(query.get("limit", ["100"])[0])
+                start = (page - 1) * limit
+                docs = [{"video_id": video_id} for video_id in server.video_ids[start:start + limit]]
+                body = json.dumps({"docs": docs, "hasNextPage": start + limit < len(server.video_ids)}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_video(self):
+                remaining = server.video_bytes
+                byte_range = self.headers.get("Range", "")
+                if byte_range.startswith("bytes="):
+                    first, _, last = byte_range[len("bytes="):].partition("-")
+                    last = min(int(last), server.video_bytes - 1) if last else server.video_bytes - 1
+                    remaining = last - int(first or 0) + 1
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {first or 0}-{last}/{server.video_bytes}")
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Type", "video/mp4")
+                self.send_header("Content-Length", str(remaining))
+                self.end_headers()
+                while remaining > 0:
+                    chunk = payload[:min(remaining, len(payload))]
+                    self.wfile.write(chunk)
+                    remaining -= len(chunk)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class FakeAcsClient:
+    """Stand-in for aliyunsdkcore AcsClient answering GetVideoList and GetMezzanineInfo."""
+
+    def __init__(self, catalogue, server, latency=0.0):
+        self.catalogue = catalogue
+        self.video_list = list(catalogue.values())
+        self.server = server
+        self.latency = latency
+
+    def do_action_with_exception(self, request):
+        if self.latency:
+            time.sleep(self.latency)
+        params = request.get_query_params()
+        action = request.get_action_name()
+
+        if action == "GetVideoList":
+            page_no = int(params.get("PageNo", 1))
+            page_size = int(params.get("PageSize", 100))
+            videos = self.video_list
+            start_time = params.get("StartTime")
+            if start_time:
+                videos = [video for video in videos if video["CreationTime"] >= start_time]
+            start = (page_no - 1) * page_size
+            return json.dumps({
+                "Total": len(videos),
+                "VideoList": {"Video": videos[start:start + page_size]},
+            }).encode()
+
+        if action == "GetMezzanineInfo":
+            video_id = params.get("VideoId")
+            return json.dumps({
+                "Mezzanine": {
+                    "VideoId": video_id,
+                    "FileURL": self.server.video_url(video_id),
+                    "Size": self.catalogue[video_id]["Size"],
+                }
+            }).encode()
+
+        raise ValueError(f"FakeAcsClient does not implement {action}")
+
+
+class LatencyRecorder:
+    """Collects per-call latencies for named stages."""
+
+    def __init__(self):
+        self.samples = {}
+        self.first_call = {}
+        self.lock = threading.Lock()
+
+    def wrap(self, stage, func):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            with self.lock:
+                self.first_call.setdefault(stage, start)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self.lock:
+                    self.samples.setdefault(stage, []).append(elapsed)
+        return timed
+
+    def summary(self):
+        return {stage: summarize_latencies(values) for stage, values in self.samples.items()}
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize_latencies(values):
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux and bytes on macOS
+    if sys.platform == "darwin":
+        return round(peak / (1024 * 1024), 2)
+    return round(peak / 1024, 2)
+
+
+def benchmark_preparation(catalogue, repeat=3):
+    """
+    Time the batch preparation stage (prepare.py) on a copy of the catalogue, and the S3 tag
+    set that the transfer builds per upload. Small catalogues are repeated more often, until
+    PREP_MIN_RECORDS records have been timed.
+
+    Returns:
+        dict: Best-of-`repeat` cost per record in microseconds of each preparation step.
+    """
+    import prepare
+
+    repeat = max(repeat, -(-PREP_MIN_RECORDS // max(len(catalogue), 1)))
+    best = {}
+    for _ in range(repeat):
+        metadata = copy.deepcopy(catalogue)
+        for video_id, video in metadata.items():
+            video["object_key"] = f"lesson/{int(video_id[5:]) % 100}/{video_id}"
+        prepare.format_creation_time.cache_clear()
+
+        start = time.perf_counter()
+        prepare.assign_unique_titles(metadata)
+        titled = time.perf_counter()
+        prepare.prepare_catalogue(metadata)
+        prepared = time.perf_counter()
+        for video in metadata.values():
+            prepare.build_tags(video["Title"], prepare.bytes_to_mb(video["Size"]), video["CreateTime"])
+        tagged = time.perf_counter()
+
+        steps = (("unique_titles", titled - start), ("dynamodb_items", prepared - titled), ("tags", tagged - prepared))
+        for step, seconds in steps:
+            best[step] = min(best.get(step, seconds), seconds)
+    return {step: round(seconds / max(len(catalogue), 1) * 1e6, 3) for step, seconds in best.items()}
+
+
+def setup_aws_resources(utils):
+    """
+    Create the buckets, table, topic and queue the pipeline expects inside moto.
+    The clients come from a fresh config.ClientRegistry, created inside moto, so the benchmark
+    runs with the registry's connection pools and retry modes.
+    """
+    import config
+
+    config.CLIENTS = config.ClientRegistry()
+    s3 = config.CLIENTS.get("s3")
+    dynamodb = config.CLIENTS.get("dynamodb")
+    sns = config.CLIENTS.get("sns")
+    sqs = config.CLIENTS.get("sqs")
+
+    for bucket in (utils.AWS_VIDEO_BUCKET, utils.AWS_LOG_BUCKET):
+        s3.create_bucket(Bucket=bucket, CreateBucketConfiguration={"LocationConstraint": BENCH_REGION})
+    dynamodb.create_table(
+        TableName=utils.DYNAMODB_TABLE,
+        KeySchema=[{"AttributeName": "video_id", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "video_id", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+
+    utils.SNS_TOPIC_ARN = sns.create_topic(Name="ali-video-transfer-bench")["TopicArn"]
+    utils.SQS_QUEUE_URL = sqs.create_queue(QueueName="ali-video-transfer-bench")["QueueUrl"]
+
+
+def run_benchmark(catalogue_name, video_count, video_mb, latency=0.0, api_latency=0.0, pacing=0.0,
+                  upload_settings=None, duplicate_every=0, concurrency=None, streaming=False):
+    """
+    Run crawl, match, DynamoDB load and transfer against local stand-ins.
+    `upload_settings` overrides the S3 upload strategy constants (e.g. {"S3_SINGLE_PUT_MAX_MB": 8}).
+    With `streaming` the same work (plus the mezzanine lookups) runs through pipeline.StreamingPipeline.
+
+    Returns:
+        dict: Benchmark results (throughput, per-stage latency, peak RSS).
+    """
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+    os.environ.setdefault("AWS_DEFAULT_REGION", BENCH_REGION)
+
+    try:
+        from moto import mock_aws
+    except ImportError:
+        print("moto is required for the benchmark: pip install -r requirements-bench.txt")
+        sys.exit(1)
+
+    import config
+    import metrics
+    import pipeline
+    import utils
+
+    catalogue = build_catalogue(video_count, video_mb, duplicate_every)
+    video_bytes = int(video_mb * 1024 * 1024)
+    recorder = LatencyRecorder()
+    stage_seconds = {}
+
+    with tempfile.TemporaryDirectory() as work_dir, \
+            SyntheticVideoServer(catalogue, video_bytes, latency) as server, \
+            mock_aws():
+        utils.Ali_client = FakeAcsClient(catalogue, server, api_latency)
+        utils.FILTER_API_URL = f"{server.base_url}/valid-ids"
+        utils.FINAL_METADATA_LOCAL_PATH = os.path.join(work_dir, "final_metadata.json")
+        utils.FAILED_LOG_FILENAME = os.path.join(work_dir, "transfer_failed.log")
+        utils.COMPLETED_LOG_FILENAME = os.path.join(work_dir, "completed_video_count.log")
+        utils.TEMP_VIDEO_LOCAL_PATH = os.path.join(work_dir, "videos")
+        utils.TRANSFER_PACING_SECONDS = pacing
+        # config sizes the S3 part concurrency and connection pool from the same settings
+        if concurrency:
+            utils.TRANSFER_CONCURRENCY = config.TRANSFER_CONCURRENCY = concurrency
+        for name, value in (upload_settings or {}).items():
+            setattr(utils, name, value)
+            setattr(config, name, value)
+        upload_settings = {name: getattr(utils, name) for name in UPLOAD_SETTINGS}
+        # After the overrides above, which size the client connection pools
+        setup_aws_resources(utils)
+        metrics.METRICS_TEXTFILE_PATH = os.path.join(work_dir, "metrics.prom")
+        metrics.METRICS_JSON_PATH = os.path.join(work_dir, "metrics.json")
+        utils.STATUS_JOURNAL.path = os.path.join(work_dir, "status_journal.db")
+        os.makedirs(utils.TEMP_VIDEO_LOCAL_PATH)
+
+        utils.fetch_metadata_batch = recorder.wrap("aliyun_list_page", utils.fetch_metadata_batch)
+        utils.download_and_transfer_video = recorder.wrap("transfer_video", utils.download_and_transfer_video)
+        utils.update_video_status = recorder.wrap("status_update", utils.update_video_status)
+
+        run_start = time.perf_counter()
+        if streaming:
+            run_streaming(utils, pipeline, server, stage_seconds)
+        else:
+            run_phases(utils, server, stage_seconds)
+
+        # Stop the write-behind flusher while DynamoDB is still mocked
+        utils.STATUS_JOURNAL.stop()
+        # A scan page stops at 1 MB, a few thousand items
+        pages = utils.dynamodb_client.get_paginator("scan").paginate(
+            TableName=utils.DYNAMODB_TABLE, ProjectionExpression="Transfer_Status")
+        statuses = [item["Transfer_Status"]["S"] for page in pages for item in page["Items"]]
+
+    # Read before the preparation benchmark below, whose catalogue copies would inflate it
+    peak_rss = peak_rss_mb()
+    transferred = recorder.samples.get("transfer_video", [])
+    transfer_seconds = stage_seconds["transfer"] or 1e-9
+    first_transfer = recorder.first_call.get("transfer_video")
+    return {
+        "catalogue": catalogue_name,
+        "videos": video_count,
+        "video_mb": video_mb,
+        "latency_s": latency,
+        "api_latency_s": api_latency,
+        "pacing_s": pacing,
+        "duplicate_every": duplicate_every,
+        "concurrency": utils.TRANSFER_CONCURRENCY,
+        "streaming": streaming,
+        "upload_settings": upload_settings,
+        "clients": {
+            service: {"max_pool_connections": client.meta.config.max_pool_connections,
+                      "retry_mode": client.meta.config.retries["mode"]}
+            for service, client in sorted(config.CLIENTS.created().items())
+        },
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "completed_in_dynamodb": statuses.count("completed"),
+        "videos_per_s": round(len(transferred) / transfer_seconds, 3),
+        "mb_per_s": round(len(transferred) * video_mb / transfer_seconds, 3),
+        "time_to_first_transfer_s": round(first_transfer - run_start, 3) if first_transfer else None,
+        "prep_us_per_record": benchmark_preparation(catalogue),
+        "stage_seconds": {stage: round(seconds, 3) for stage, seconds in stage_seconds.items()},
+        "stage_latency": recorder.summary(),
+        "transfer_stages": {
+            stage: {key: histogram[key] for key in ("count", "mean", "p50", "p99")}
+            for stage, histogram in metrics.TRANSFER_METRICS.snapshot()["stages"].items()
+        },
+        "peak_rss_mb": peak_rss,
+    }
+
+
+def run_phases(utils, server, stage_seconds):
+    """The phase-by-phase workflow: crawl, match, DynamoDB load, then transfer."""
+    # Stage 1: crawl the catalogue (oldest batch, without the 10 s settle wait)
+    start = time.perf_counter()
+    metadata = utils.fetch_first_batch()
+    stage_seconds["crawl"] = time.perf_counter() - start
+
+    # Stage 2: match against the valid-ids API
+    start = time.perf_counter()
+    matched_metadata, _ = utils.fetch_all_docs_and_match(metadata)
+    stage_seconds["match"] = time.perf_counter() - start
+
+    for video_id, video in matched_metadata.items():
+        video["unique_title"] = f"{video_id}.mp4"
+        video["object_key"] = f"lesson/{int(video_id[5:]) % 100}/{video_id}"
+        video["FileURL"] = server.video_url(video_id)
+        video["FinalDownloadURL"] = server.video_url(video_id)
+    utils.mark_duplicate_videos(matched_metadata)
+    with open(utils.FINAL_METADATA_LOCAL_PATH, "w", encoding="utf-8") as f:
+        json.dump(matched_metadata, f, ensure_ascii=False)
+
+    # Stage 3: load DynamoDB
+    start = time.perf_counter()
+    utils.upload_metadata_to_dynamodb(utils.FINAL_METADATA_LOCAL_PATH)
+    stage_seconds["dynamodb_load"] = time.perf_counter() - start
+
+    # Stage 4: transfer every pending video
+    start = time.perf_counter()
+    utils.transfer_videos(enable_notifications=False)
+    stage_seconds["transfer"] = time.perf_counter() - start
+
+
+def run_streaming(utils, pipeline, server, stage_seconds):
+    """The streaming pipeline, with the lesson API and final URLs answered locally."""
+    pipeline.METADATA_SETTLE_SECONDS = 0
+    pipeline.FINAL_METADATA_LOCAL_PATH = utils.FINAL_METADATA_LOCAL_PATH
+    utils.generate_lesson_video_ids = lambda video_id: f"lesson/{int(video_id[5:]) % 100}/{video_id}"
+    utils.generate_final_download_url = lambda file_url, storage_location: file_url
+
+    start = time.perf_counter()
+    pipeline.StreamingPipeline(enable_notifications=False).run()
+    stage_seconds["transfer"] = time.perf_counter() - start
+
+def print_results(results):
+    print(f"\nBenchmark '{results['catalogue']}': {results['videos']} videos x {results['video_mb']} MB")
+    print(f"  Mode:       {'streaming pipeline' if results.get('streaming') else 'phase by phase'}")
+    print(f"  Runs:       best of {results.get('repeats', 1)}")
+    print(f"  Throughput: {results['videos_per_s']} videos/s, {results['mb_per_s']} MB/s")
+    print(f"  First transfer after {results.get('time_to_first_transfer_s')} s")
+    print(f"  Completed:  {results['completed_in_dynamodb']} videos marked completed in DynamoDB")
+    print(f"  Peak RSS:   {results['peak_rss_mb']} MB")
+    print(f"  Upload:     {results['upload_settings']}")
+    print(f"  Clients:    {results.get('clients', {})}")
+    for step, micros in results.get("prep_us_per_record", {}).items():
+        print(f"  Prep {step:<17} {micros:>10.3f} us/record")
+    for stage, seconds in results["stage_seconds"].items():
+        print(f"  Stage {stage:<14} {seconds:>10.3f} s")
+    for stage, latency in results["stage_latency"].items():
+        print(f"  Latency {stage:<18} n={latency['count']:<6} p50={latency['p50_ms']} ms  p99={latency['p99_ms']} ms")
+    for stage, histogram in results.get("transfer_stages", {}).items():
+        print(f"  Transfer stage {stage:<14} n={histogram['count']:<6} mean={histogram['mean']} s  "
+              f"p50<={histogram['p50']} s  p99<={histogram['p99']} s")
+
+
+def baseline_path(catalogue_name):
+    return os.path.join(BASELINE_FOLDER, f"{catalogue_name}.json")
+
+
+def save_baseline(results):
+    path = baseline_path(results["catalogue"])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Baseline saved to {path}")
+
+
+def best_of(runs):
+    """
+    Combine repeated runs into one result: the highest throughput, and the lowest p50 latency,
+    preparation cost and peak RSS of any run. The other values are those of the fastest run.
+    """
+    best = copy.deepcopy(max(runs, key=lambda run: run["videos_per_s"]))
+    best["repeats"] = len(runs)
+    best["mb_per_s"] = max(run["mb_per_s"] for run in runs)
+    best["peak_rss_mb"] = min(run["peak_rss_mb"] for run in runs)
+    first_transfers = [run["time_to_first_transfer_s"] for run in runs if run.get("time_to_first_transfer_s") is not None]
+    best["time_to_first_transfer_s"] = min(first_transfers) if first_transfers else None
+    for step in best.get("prep_us_per_record", {}):
+        best["prep_us_per_record"][step] = min(run["prep_us_per_record"][step] for run in runs
+                                               if step in run.get("prep_us_per_record", {}))
+    for stage, latency in best["stage_latency"].items():
+        latency["p50_ms"] = min(run["stage_latency"][stage]["p50_ms"] for run in runs
+                                if stage in run["stage_latency"])
+    return best
+
+
+def run_repeats(argv, repeats):
+    """
+    Run the benchmark `repeats` times, each in a fresh process so patched modules, metrics and
+    peak RSS do not carry over, and combine the runs with best_of.
+    """
+    # The repeats only measure; saving and comparing happen once on the combined result
+    child_argv = [arg for arg in argv if arg not in ("--compare", "--save-baseline")]
+    runs = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for index in range(repeats):
+            output = os.path.join(work_dir, f"run_{index}.json")
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), *child_argv, "--repeats", "1", "--output", output],
+                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+            )
+            if completed.returncode != 0:
+                print(completed.stdout)
+                print(f"Benchmark run {index + 1}/{repeats} failed with exit code {completed.returncode}")
+                sys.exit(1)
+            with open(output, "r", encoding="utf-8") as f:
+                runs.append(json.load(f))
+            print(f"Run {index + 1}/{repeats}: {runs[-1]['videos_per_s']} videos/s")
+    return best_of(runs)
+
+
+def compare_to_baseline(results, tolerance, micro_tolerance):
+    """
+    Compare results against the saved baseline for the same catalogue.
+    Only throughput and p50 latencies are gated: p50 latencies under COMPARE_MICRO_MS and the
+    per-record preparation costs use `micro_tolerance`, and latencies with fewer than
+    COMPARE_MIN_SAMPLES samples are skipped. Peak RSS and p99 latencies are reported only.
+
+    Returns:
+        bool: True if no gated metric regressed by more than its tolerance (a fraction).
+    """
+    path = baseline_path(results["catalogue"])
+    if not os.path.exists(path):
+        print(f"No baseline found at {path}, save one with --save-baseline")
+        return False
+
+    with open(path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    # Throughput and RSS only compare between runs of the same shape
+    shape = ("videos", "video_mb", "streaming", "duplicate_every", "concurrency")
+    different = [key for key in shape if baseline.get(key) != results.get(key)]
+    if different:
+        print(f"Baseline {path} was recorded with different settings ({', '.join(different)}), not comparable")
+        return False
+
+    # (metric name, baseline value, current value, True if higher is better, tolerance or None if not gated)
+    checks = [
+        ("videos_per_s", baseline["videos_per_s"], results["videos_per_s"], True, tolerance),
+        ("mb_per_s", baseline["mb_per_s"], results["mb_per_s"], True, tolerance),
+        ("peak_rss_mb", baseline["peak_rss_mb"], results["peak_rss_mb"], False, None),
+    ]
+    for step, micros in results.get("prep_us_per_record", {}).items():
+        if step in baseline.get("prep_us_per_record", {}):
+            checks.append((f"prep.{step}_us", baseline["prep_us_per_record"][step], micros, False, micro_tolerance))
+    for stage, latency in results["stage_latency"].items():
+        old = baseline.get("stage_latency", {}).get(stage)
+        if old is None:
+            continue
+        if min(old["count"], latency["count"]) < COMPARE_MIN_SAMPLES:
+            p50_tolerance = None
+        else:
+            p50_tolerance = micro_tolerance if old["p50_ms"] < COMPARE_MICRO_MS else tolerance
+        checks.append((f"{stage}.p50_ms", old["p50_ms"], latency["p50_ms"], False, p50_tolerance))
+        checks.append((f"{stage}.p99_ms", old["p99_ms"], latency["p99_ms"], False, None))
+
+    print(f"\nComparison against baseline from {baseline.get('created', 'unknown')} "
+          f"(best of {baseline.get('repeats', 1)}, now best of {results.get('repeats', 1)}):")
+    passed = True
+    for name, old, new, higher_is_better, allowed in checks:
+        change = (new - old) / old if old else 0.0
+        if allowed is None:
+            marker = "info"
+        else:
+            regressed = change < -allowed if higher_is_better else change > allowed
+            passed = passed and not regressed
+            marker = f"REGRESSED (>{allowed:.0%})" if regressed else "ok"
+        print(f"  {name:<28} {old:>12} -> {new:<12} ({change:+.1%}) {marker}")
+    return passed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark for the video transfer pipeline.")
+    parser.add_argument("--catalogue", choices=sorted(STANDARD_CATALOGUES), default="small")
+    parser.add_argument("--videos", type=int, help="Override the number of videos in the catalogue.")
+    parser.add_argument("--video-mb", type=float, help="Override the size of each synthetic video in MB.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Per-request latency of the video server (s).")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="Per-call latency of the fake AcsClient (s).")
+    parser.add_argument("--pacing", type=float, default=0.0, help="Value for TRANSFER_PACING_SECONDS during the run.")
+    parser.add_argument("--concurrency", type=int, help="Override TRANSFER_CONCURRENCY (transfer workers).")
+    parser.add_argument("--streaming", action="store_true", help="Run the streaming pipeline (pipeline.py).")
+    parser.add_argument("--duplicate-every", type=int, default=0, help="Make every Nth video a duplicate upload.")
+    parser.add_argument("--single-put-max-mb", type=float, help="Override S3_SINGLE_PUT_MAX_MB.")
+    parser.add_argument("--chunk-mb", type=int, help="Override S3_MULTIPART_CHUNK_MB.")
+    parser.add_argument("--upload-bandwidth-mb", type=float, help="Override S3_UPLOAD_BANDWIDTH_MB_PER_S.")
+    parser.add_argument("--prep-only", action="store_true",
+                        help="Only measure the per-record cost of the preparation stage (no AWS mocks needed).")
+    parser.add_argument("--save-baseline", action="store_true", help="Save the results as the catalogue baseline.")
+    parser.add_argument("--compare", action="store_true", help="Compare the results with the saved baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Allowed throughput and p50 latency regression before failing (fraction).")
+    parser.add_argument("--micro-tolerance", type=float, default=0.50,
+                        help=f"Allowed regression of preparation costs and p50 latencies under {COMPARE_MICRO_MS} ms.")
+    parser.add_argument("--repeats", type=int, default=BENCH_REPEATS,
+                        help="Run the benchmark this many times and keep the best results.")
+    parser.add_argument("--output", help="Write the results as JSON to this path.")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own output during the run.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    args = parse_args(argv)
+    catalogue = STANDARD_CATALOGUES[args.catalogue]
+    video_count = args.videos or catalogue["videos"]
+    video_mb = args.video_mb or catalogue["video_mb"]
+    upload_settings = {
+        name: value for name, value in (
+            ("S3_SINGLE_PUT_MAX_MB", args.single_put_max_mb),
+            ("S3_MULTIPART_CHUNK_MB", args.chunk_mb),
+            ("S3_UPLOAD_BANDWIDTH_MB_PER_S", args.upload_bandwidth_mb),
+        ) if value is not None
+    }
+
+    if args.prep_only:
+        print(f"Preparation cost for {video_count} videos:")
+        for step, micros in benchmark_preparation(build_catalogue(video_count, video_mb, args.duplicate_every)).items():
+            print(f"  {step:<17} {micros:>10.3f} us/record")
+        return
+
+    # moto passes the local video server through `responses`, which logs every request
+    logging.getLogger("responses").setLevel(logging.WARNING)
+
+    if args.repeats > 1:
+        results = run_repeats(argv, args.repeats)
+    else:
+        # The pipeline prints a line per video; keep the report readable unless asked otherwise
+        pipeline_output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+        with pipeline_output:
+            results = run_benchmark(args.catalogue, video_count, video_mb, args.latency, args.api_latency, args.pacing,
+                                    upload_settings, args.duplicate_every, args.concurrency, args.streaming)
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        save_baseline(results)
+    if args.compare and not compare_to_baseline(results, args.tolerance, args.micro_tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
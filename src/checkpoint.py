@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import time
+from constants import *
+
+
+def file_sha256(path):
+    """sha256 of a file's content, or None if it does not exist."""
+    sha256 = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha256.update(chunk)
+    except FileNotFoundError:
+        return None
+    return sha256.hexdigest()
+
+
+def inputs_hash(*inputs):
+    """Hash of a stage's inputs (JSON-serialisable values, e.g. upstream output hashes)."""
+    data = json.dumps([CHECKPOINT_VERSION, *inputs], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class CheckpointManifest:
+    """
+    Manifest of completed pipeline stages, so a restarted run resumes at the first incomplete one.
+
+    Each entry records the hash of the stage's inputs, the sha256 of its result (kept as JSON in
+    `output_dir`) and of any files it wrote. A checkpoint is reused only while its input hash
+    matches, every recorded file is unchanged and it is younger than CHECKPOINT_MAX_AGE_HOURS
+    (or the stage's own `max_age_hours`, e.g. for results holding signed URLs).
+    """
+
+    def __init__(self, path=None, output_dir=None):
+        self.path = path or CHECKPOINT_MANIFEST_PATH
+        self.output_dir = output_dir or CHECKPOINT_DIR
+        self.stages = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable checkpoint manifest {self.path}: {e}")
+            return {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.stages, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _result_path(self, stage):
+        return os.path.join(self.output_dir, f"{stage}.json")
+
+    def output_hash(self, stage):
+        """Hash of a completed stage's result and files, used as the input of the stages after it."""
+        entry = self.stages.get(stage, {})
+        return inputs_hash(entry.get("result_sha256"), entry.get("files"))
+
+    def lookup(self, stage, input_hash, max_age_hours=None):
+        """Return the checkpoint entry of `stage` if it is still valid for `input_hash`, else None."""
+        entry = self.stages.get(stage)
+        if not entry or entry["input_hash"] != input_hash:
+            return None
+        if time.time() - entry["completed_at"] > (max_age_hours or CHECKPOINT_MAX_AGE_HOURS) * 3600:
+            return None
+        if entry["result_sha256"] and file_sha256(self._result_path(stage)) != entry["result_sha256"]:
+            return None
+        if any(file_sha256(path) != sha256 for path, sha256 in entry["files"].items()):
+            return None
+        return entry
+
+    def complete(self, stage, input_hash, result=None, files=()):
+        """Record a completed stage with its (JSON-serialisable) result and output files."""
+        result_sha256 = None
+        if result is not None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            result_path = self._result_path(stage)
+            with open(result_path, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False)
+            result_sha256 = file_sha256(result_path)
+
+        self.stages[stage] = {
+            "input_hash": input_hash,
+            "result_sha256": result_sha256,
+            "files": {path: file_sha256(path) for path in files},
+            "completed_at": time.time(),
+        }
+        self._save()
+
+    def run(self, stage, inputs, func, files=(), check=None, max_age_hours=None):
+        """
+        Run `func` for `stage` unless a valid checkpoint exists for `inputs`, then reuse its result.
+        The result is checkpointed only if `check(result)` is true (when `check` is given).
+        `max_age_hours` overrides CHECKPOINT_MAX_AGE_HOURS for this stage.
+
+        Returns:
+            The stage result (as loaded back from JSON when the stage was skipped).
+        """
+        input_hash = inputs_hash(stage, *inputs)
+        entry = self.lookup(stage, input_hash, max_age_hours)
+        if entry is not None:
+            print(f"Skipping stage '{stage}': checkpoint from {time.ctime(entry['completed_at'])} is valid.")
+            if not entry["result_sha256"]:
+                return None
+            with open(self._result_path(stage), "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        result = func()
+        if check is None or check(result):
+            self.complete(stage, input_hash, result, files)
+        else:
+            print(f"Stage '{stage}' did not produce a usable result; not checkpointed.")
+        return result
+
+    def reset(self):
+        """Forget every checkpoint, so the next run starts from the beginning."""
+        self.stages = {}
+        self._save()
@@ -1,11 +1,94 @@
+import math
+import threading
 import boto3
+import botocore.session
+from botocore.config import Config
 from constants import *
 from aliyunsdkcore.client import AcsClient
 
-# Initialize AWS clients
-s3_client = boto3.client('s3',region_name='ap-southeast-2')
-dynamodb_client = boto3.client('dynamodb',region_name='ap-southeast-2')
-sns_client = boto3.client('sns',region_name='ap-southeast-2')
-sqs_client = boto3.client('sqs',region_name='ap-southeast-2')
-Ali_client = AcsClient(ALI_ACCESS_KEY_ID, ALI_ACCESS_KEY_SECRET,ALI_VOD_REGION)
-logs_client = boto3.client("logs", region_name="ap-southeast-2")
\ No newline at end of file
+
+class ClientRegistry:
+    """
+    Lazily creates AWS and Aliyun clients on first use and shares them across threads.
+    All boto3 clients come from one botocore session; connection pools and retry modes
+    are sized from TRANSFER_CONCURRENCY.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._session = None
+        self._clients = {}
+
+    def get(self, service_name):
+        client = self._clients.get(service_name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(service_name)
+                if client is None:
+                    client = self._create(service_name)
+                    self._clients[service_name] = client
+        return client
+
+    def created(self):
+        """The clients created so far, by service name."""
+        with self._lock:
+            return dict(self._clients)
+
+    def _create(self, service_name):
+        if service_name == "ali_vod":
+            return AcsClient(ALI_ACCESS_KEY_ID, ALI_ACCESS_KEY_SECRET, ALI_VOD_REGION,
+                             pool_size=TRANSFER_CONCURRENCY + 2)
+
+        if self._session is None:
+            self._session = boto3.session.Session(botocore_session=botocore.session.get_session(),
+                                                  region_name=AWS_REGION)
+        return self._session.client(service_name, config=client_config(service_name))
+
+
+def s3_part_concurrency():
+    """
+    Parallel part uploads per multipart upload. The TRANSFER_CONCURRENCY uploads running at once
+    share S3_UPLOAD_BANDWIDTH_MB_PER_S, so each gets the connections its share needs.
+    """
+    share_mb_per_s = S3_UPLOAD_BANDWIDTH_MB_PER_S / TRANSFER_CONCURRENCY
+    return max(1, min(S3_UPLOAD_MAX_CONCURRENCY, math.ceil(share_mb_per_s / S3_PER_CONNECTION_MB_PER_S)))
+
+
+def client_config(service_name):
+    """Connection pool size and retry mode for a boto3 client."""
+    # Each S3 upload runs its own pool of part-upload threads
+    if service_name == "s3":
+        pool_size = TRANSFER_CONCURRENCY * s3_part_concurrency() + 2
+    else:
+        pool_size = TRANSFER_CONCURRENCY + 2
+    return Config(
+        max_pool_connections=max(pool_size, 10),
+        retries={
+            "mode": AWS_RETRY_MODES.get(service_name, "standard"),
+            "max_attempts": AWS_RETRY_MAX_ATTEMPTS,
+        },
+    )
+
+
+class LazyClient:
+    """Stand-in for a client that is only created when one of its methods is first used."""
+
+    def __init__(self, service_name):
+        self._service_name = service_name
+
+    def __getattr__(self, name):
+        return getattr(CLIENTS.get(self._service_name), name)
+
+    def __repr__(self):
+        return f"LazyClient({self._service_name!r})"
+
+
+CLIENTS = ClientRegistry()
+
+# Initialize AWS clients (created on first use)
+s3_client = LazyClient("s3")
+dynamodb_client = LazyClient("dynamodb")
+sns_client = LazyClient("sns")
+sqs_client = LazyClient("sqs")
+Ali_client = LazyClient("ali_vod")
+logs_client = LazyClient("logs")
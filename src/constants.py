@@ -14,4 +14,69 @@ TEMP_VIDEO_LOCAL_PATH = "/data"
 VIDEO_BUCKET_FOLDER = 'ali-videos'
 FILTER_API_URL = "https://uat-api.jiangren.com.au/videos/ali-cloud/valid-ids"  
 PAGE_SIZE = 100  
-BASE_API_URL = "https://uat-api.jiangren.com.au/s3-videos/ali-cloud"
\ No newline at end of file
+BASE_API_URL = "https://uat-api.jiangren.com.au/s3-videos/ali-cloud"
+TRANSFER_PACING_SECONDS = 0.5
+METRICS_TEXTFILE_PATH = "/home/ubuntu/ali_video_transfer.prom"
+METRICS_JSON_PATH = "/home/ubuntu/ali_video_transfer_metrics.json"
+METRICS_EXPORT_INTERVAL_SECONDS = 15
+PROGRESS_RATE_SMOOTHING = 0.2
+AWS_REGION = 'ap-southeast-2'
+TRANSFER_CONCURRENCY = 8
+S3_UPLOAD_MAX_CONCURRENCY = 10
+AWS_RETRY_MODES = {"dynamodb": "adaptive", "s3": "standard", "sns": "standard", "sqs": "standard", "logs": "standard"}
+AWS_RETRY_MAX_ATTEMPTS = 10
+S3_SINGLE_PUT_MAX_MB = 64
+S3_MULTIPART_CHUNK_MB = 16
+S3_MIN_PART_MB = 5
+S3_MAX_PARTS = 10000
+S3_UPLOAD_BANDWIDTH_MB_PER_S = 100
+S3_PER_CONNECTION_MB_PER_S = 10
+S3_COPY_OBJECT_MAX_MB = 5 * 1024
+METADATA_GZIP_LEVEL = 6
+METADATA_SPOOL_MAX_MB = 32
+METADATA_WRITE_BUFFER_BYTES = 1024 * 1024
+PRIORITY_LIST_PATH = "/home/ubuntu/transfer_priority.json"
+PRIORITY_RECENT_DAYS = 180
+PRIORITY_AGING_SECONDS = 300
+PRIORITY_REFRESH_SECONDS = 5
+FAST_LANE_WORKERS = 1
+FAST_LANE_BORROW_MAX_MB = 100
+FAST_LANE_BORROW_PERCENTILE = 50  # Fast-lane workers also borrow videos up to this percentile of the catalogue sizes
+FAST_LANE_SCAN_DEPTH = 500
+STORAGE_ENDPOINT_CANDIDATES = {}  # StorageLocation -> extra download hosts (accelerate endpoint, CDN domain, ...)
+ENDPOINT_USE_OSS_ACCELERATE = False
+ENDPOINT_PROBE_BYTES = 256 * 1024
+ENDPOINT_PROBE_TIMEOUT_SECONDS = 10
+ENDPOINT_REFERENCE_MB = 100
+ENDPOINT_RANKING_TTL_SECONDS = 900
+ENDPOINT_FAILURE_COOLDOWN_SECONDS = 300
+DOWNLOAD_CONNECT_TIMEOUT_SECONDS = 10
+DOWNLOAD_READ_TIMEOUT_SECONDS = 60  # Longest wait for the next chunk of a download
+STATUS_JOURNAL_ENABLED = True
+STATUS_JOURNAL_PATH = "/home/ubuntu/transfer_status_journal.db"
+STATUS_FLUSH_INTERVAL_SECONDS = 5
+STATUS_FLUSH_BATCH_SIZE = 25
+STATUS_FLUSH_WORKERS = 4
+RECONCILE_PREFIX = "lesson/"
+RECONCILE_OUTPUT_DIR = "/home/ubuntu/reconcile"
+RECONCILE_SCAN_SEGMENTS = 8
+RECONCILE_BATCH_SIZE = 1000
+RECONCILE_SIZE_TOLERANCE_MB = 0.011  # Size_MB is rounded to 2 decimals
+PROFILE_STAGES = ("metadata", "json", "dynamodb", "transfer")
+PROFILE_OUTPUT_DIR = "/home/ubuntu/profiles"
+PROFILE_SAMPLE_INTERVAL_SECONDS = 0.01
+PROFILE_TRACEMALLOC_FRAMES = 1
+PROFILE_TRACEMALLOC_WINDOW_SECONDS = 0.5
+PROFILE_TRACEMALLOC_INTERVAL_SECONDS = 30
+PROFILE_TOP_ALLOCATIONS = 25
+CHECKPOINT_VERSION = 1  # Bump to invalidate checkpoints when a stage's output format changes
+CHECKPOINT_DIR = "/home/ubuntu/checkpoints"
+CHECKPOINT_MANIFEST_PATH = "/home/ubuntu/checkpoints/manifest.json"
+CHECKPOINT_MAX_AGE_HOURS = 72
+CHECKPOINT_URL_MAX_AGE_HOURS = 1  # Final URLs are signed for MEZZANINE_AUTH_TIMEOUT_SECONDS only
+METADATA_SETTLE_SECONDS = 10
+MEZZANINE_AUTH_TIMEOUT_SECONDS = 7200
+STREAM_QUEUE_SIZE = 200
+STREAM_ENRICH_WORKERS = 8
+STREAM_REGISTER_WORKERS = 2
+PREPARE_TIME_CACHE_SIZE = 65536
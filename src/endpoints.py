@@ -0,0 +1,125 @@
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+import requests
+from constants import *
+
+
+class EndpointSelector:
+    """
+    Picks the fastest healthy download host for each StorageLocation.
+
+    The candidates for a location are the location itself, any hosts configured in
+    STORAGE_ENDPOINT_CANDIDATES (OSS accelerate endpoint, CDN domain, ...) and, with
+    ENDPOINT_USE_OSS_ACCELERATE, the bucket's oss-accelerate endpoint. Candidates are ranked
+    with small ranged GET probes (time-to-first-byte and throughput); the ranking is cached
+    for ENDPOINT_RANKING_TTL_SECONDS and hosts that fail a download (see is_host_failure) are
+    skipped for ENDPOINT_FAILURE_COOLDOWN_SECONDS.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.location_locks = {}
+        self.rankings = {}
+        self.failed_until = {}
+
+    def candidates_for(self, storage_location):
+        candidates = [storage_location] + list(STORAGE_ENDPOINT_CANDIDATES.get(storage_location, []))
+        if ENDPOINT_USE_OSS_ACCELERATE and ".oss-" in storage_location:
+            bucket = storage_location.split(".oss-", 1)[0]
+            candidates.append(f"{bucket}.oss-accelerate.aliyuncs.com")
+        return list(dict.fromkeys(candidates))
+
+    def probe(self, url):
+        """
+        Fetch the first ENDPOINT_PROBE_BYTES of `url`.
+
+        Returns:
+            tuple: (time-to-first-byte in seconds, throughput in MB/s), or None if the probe failed.
+        """
+        start = time.perf_counter()
+        try:
+            with requests.get(url, headers={"Range": f"bytes=0-{ENDPOINT_PROBE_BYTES - 1}"},
+                              stream=True, timeout=ENDPOINT_PROBE_TIMEOUT_SECONDS) as response:
+                response.raise_for_status()
+                received = 0
+                first_byte = None
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    if first_byte is None:
+                        first_byte = time.perf_counter()
+                    received += len(chunk)
+                    if received >= ENDPOINT_PROBE_BYTES:
+                        break
+        except requests.exceptions.RequestException as e:
+            print(f"Endpoint probe failed for {urlsplit(url).netloc}: {e}")
+            return None
+
+        end = time.perf_counter()
+        first_byte = first_byte or end
+        transfer_seconds = max(end - first_byte, 1e-6)
+        return first_byte - start, received / (1024 * 1024) / transfer_seconds
+
+    def rank(self, storage_location, sample_url):
+        """Return the candidate hosts for a location, fastest first (cached for the TTL)."""
+        candidates = self.candidates_for(storage_location)
+        if len(candidates) == 1:
+            return candidates
+
+        with self.lock:
+            location_lock = self.location_locks.setdefault(storage_location, threading.Lock())
+
+        # One probe round per location at a time; other workers wait and reuse its ranking
+        with location_lock:
+            cached = self.rankings.get(storage_location)
+            if cached and time.monotonic() - cached[0] < ENDPOINT_RANKING_TTL_SECONDS:
+                return cached[1]
+
+            scores = {}
+            for host in candidates:
+                result = self.probe(replace_host(sample_url, host))
+                if result is not None:
+                    ttfb, mb_per_s = result
+                    # Expected time to fetch ENDPOINT_REFERENCE_MB from this host
+                    scores[host] = ttfb + ENDPOINT_REFERENCE_MB / max(mb_per_s, 1e-6)
+
+            ranking = sorted(scores, key=scores.get) + [host for host in candidates if host not in scores]
+            self.rankings[storage_location] = (time.monotonic(), ranking)
+            print(f"Endpoint ranking for {storage_location}: "
+                  + ", ".join(f"{host} ({scores[host]:.2f}s)" if host in scores else f"{host} (failed)" for host in ranking))
+            return ranking
+
+    def urls_for(self, download_url):
+        """Candidate download URLs for `download_url`, fastest healthy host first."""
+        storage_location = urlsplit(download_url).netloc
+        now = time.monotonic()
+        ranking = self.rank(storage_location, download_url)
+        healthy = [host for host in ranking if self.failed_until.get(host, 0) <= now]
+        unhealthy = [host for host in ranking if host not in healthy]
+        return [replace_host(download_url, host) for host in healthy + unhealthy]
+
+    def mark_failed(self, url):
+        """Skip the host of a failed download for ENDPOINT_FAILURE_COOLDOWN_SECONDS."""
+        with self.lock:
+            self.failed_until[urlsplit(url).netloc] = time.monotonic() + ENDPOINT_FAILURE_COOLDOWN_SECONDS
+
+
+def is_host_failure(error):
+    """
+    True if a failed download says something about the host: a connection error, a timeout, a
+    broken stream or a 5xx response. Other HTTP errors (e.g. 403 for an expired signed URL)
+    belong to the one video.
+    """
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                          requests.exceptions.ChunkedEncodingError)):
+        return True
+    response = getattr(error, "response", None)
+    return response is not None and response.status_code >= 500
+
+
+def replace_host(url, host):
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, host, parts.path, parts.query, parts.fragment))
+
+
+# Shared selector used by download_and_transfer_video in utils.py
+ENDPOINT_SELECTOR = EndpointSelector()
@@ -0,0 +1,151 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from constants import *
+
+# Histogram bucket upper bounds in seconds, from small API calls up to multi-GB transfers
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+
+class Histogram:
+    """Cumulative histogram in the Prometheus style (bucket counts, sum and count)."""
+
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for index, upper_bound in enumerate(self.buckets):
+            if value <= upper_bound:
+                self.counts[index] += 1
+
+    def quantile(self, fraction):
+        """Estimate a quantile as the upper bound of the bucket that contains it."""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        for upper_bound, bucket_count in zip(self.buckets, self.counts):
+            if bucket_count >= rank:
+                return upper_bound
+        return float("inf")
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 3),
+            "mean": round(self.sum / self.count, 3) if self.count else 0.0,
+            "p50": self.quantile(0.50),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip((str(b) for b in self.buckets), self.counts)),
+        }
+
+
+class TransferMetrics:
+    """
+    In-process, thread-safe collector for per-stage transfer timings, bytes and retries.
+
+    Stage timings are kept per video until they are stored on the DynamoDB item
+    (see pop_video) and aggregated into one histogram per stage for export.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stage_histograms = {}
+        self.counters = {}
+        self.videos = {}
+        self.last_export = 0.0
+
+    @contextmanager
+    def time_stage(self, video_id, stage):
+        """Time a block of code as `stage` of the transfer of `video_id`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(video_id, stage, time.perf_counter() - start)
+
+    def observe_stage(self, video_id, stage, seconds):
+        with self.lock:
+            self.stage_histograms.setdefault(stage, Histogram()).observe(seconds)
+            if video_id is not None:
+                video = self.videos.setdefault(video_id, {"stages": {}, "bytes": 0})
+                video["stages"][stage] = round(video["stages"].get(stage, 0.0) + seconds, 3)
+
+    def add_bytes(self, video_id, direction, byte_count):
+        """Count `byte_count` bytes moved in `direction` ("download" or "upload")."""
+        with self.lock:
+            counter = f"{direction}_bytes_total"
+            self.counters[counter] = self.counters.get(counter, 0) + byte_count
+            if video_id is not None and direction == "download":
+                video = self.videos.setdefault(video_id, {"stages": {}, "bytes": 0})
+                video["bytes"] += byte_count
+
+    def inc(self, counter, amount=1):
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def pop_video(self, video_id):
+        """Return and forget the stage breakdown and byte count of one video."""
+        with self.lock:
+            return self.videos.pop(video_id, {"stages": {}, "bytes": 0})
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "timestamp": time.time(),
+                "counters": dict(self.counters),
+                "stages": {stage: histogram.to_dict() for stage, histogram in self.stage_histograms.items()},
+            }
+
+    def to_prometheus(self):
+        """Render the metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP ali_video_transfer_stage_seconds Time spent in each transfer stage.",
+            "# TYPE ali_video_transfer_stage_seconds histogram",
+        ]
+        with self.lock:
+            for stage, histogram in sorted(self.stage_histograms.items()):
+                for upper_bound, bucket_count in zip(histogram.buckets, histogram.counts):
+                    lines.append(
+                        f'ali_video_transfer_stage_seconds_bucket{{stage="{stage}",le="{upper_bound}"}} {bucket_count}'
+                    )
+                lines.append(f'ali_video_transfer_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'ali_video_transfer_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                lines.append(f'ali_video_transfer_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+            for counter, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE ali_video_transfer_{counter} counter")
+                lines.append(f"ali_video_transfer_{counter} {value}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, textfile_path=None, json_path=None):
+        """Write the Prometheus textfile and the JSON snapshot (atomically, via rename)."""
+        textfile_path = textfile_path or METRICS_TEXTFILE_PATH
+        json_path = json_path or METRICS_JSON_PATH
+        try:
+            _write_atomic(textfile_path, self.to_prometheus())
+            _write_atomic(json_path, json.dumps(self.snapshot(), indent=2))
+        except OSError as e:
+            print(f"Failed to export transfer metrics: {e}")
+        self.last_export = time.monotonic()
+
+    def maybe_export(self):
+        """Export if at least METRICS_EXPORT_INTERVAL_SECONDS passed since the last export."""
+        if time.monotonic() - self.last_export >= METRICS_EXPORT_INTERVAL_SECONDS:
+            self.export()
+
+
+def _write_atomic(path, content):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(temp_path, path)
+
+
+# Shared collector used by the transfer functions in utils.py
+TRANSFER_METRICS = TransferMetrics()
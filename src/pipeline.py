@@ -0,0 +1,265 @@
+import json
+import queue
+import threading
+import time
+from collections import Counter
+import requests
+from constants import *
+import utils
+from prepare import unique_title
+from progress import ProgressTracker
+from records import VideoRecord
+from scheduler import PriorityScheduler
+
+# Queue marker telling a worker that its upstream stage has finished
+PIPELINE_DONE = object()
+
+
+def iter_video_pages():
+    """
+    Yield pages of production videos from Aliyun VOD, oldest first: the full listing, then,
+    after METADATA_SETTLE_SECONDS, the videos created since the last one seen (as fetch_all_metadata).
+    """
+    start_time = None
+    last_creation_time = None
+    for phase in ("first", "remaining"):
+        page_no = 1
+        listed = 0
+        while True:
+            batch_response = utils.fetch_metadata_batch(page_no, 100, sort_by="CreationTime:Asc", start_time=start_time)
+            if not batch_response:
+                break  # Exit loop if an error occurs
+
+            videos = batch_response.get("VideoList", {}).get("Video", [])
+            production = [video for video in videos if video.get("CateName") == "production"]
+            for video in production:
+                last_creation_time = max(last_creation_time or "", video["CreationTime"])
+            yield production
+
+            listed += len(videos)
+            if listed >= batch_response.get("Total", 0) or not videos:
+                break
+            page_no += 1
+
+        if phase == "first":
+            if last_creation_time is None:
+                return
+            # Wait for a while to ensure no new videos are uploaded
+            time.sleep(METADATA_SETTLE_SECONDS)
+            start_time = last_creation_time
+
+
+def iter_valid_id_pages():
+    """Yield the video IDs of each page of the valid-ids API (FILTER_API_URL)."""
+    page = 1
+    try:
+        while True:
+            response = requests.get(utils.FILTER_API_URL, params={"page": page, "limit": PAGE_SIZE}, timeout=10)
+            response.raise_for_status()
+            data = response.json()
+            yield {doc["video_id"] for doc in data.get("docs", [])}
+            if not data.get("hasNextPage", False):
+                break
+            page += 1
+    except Exception as e:
+        print(f"Error during fetch: {e}")
+
+
+class StreamingPipeline:
+    """
+    Streaming alternative to the phase-by-phase workflow in transfer_video.py.
+
+    The Aliyun listing and the valid-ids API are crawled page by page at the same time and joined
+    on the video ID; each matched video then flows through enrichment workers (object key,
+    mezzanine info, final URL, unique title, dedup), DynamoDB registration and the transfer
+    workers of transfer_videos as soon as its own inputs are ready. Bounded queues between the
+    stages (and the scheduler's queue limit) give backpressure, so a fast crawl cannot run
+    ahead of the transfers by more than STREAM_QUEUE_SIZE videos per stage.
+
+    Matched videos that fail enrichment or registration are kept in `dropped` and still added to
+    the tracker's totals, so the run does not report them as transferred.
+    """
+
+    def __init__(self, tracker=None, enable_notifications=True):
+        self.enable_notifications = enable_notifications
+        self.tracker = tracker or ProgressTracker(0, 0.0)
+        self.enrich_queue = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+        self.register_queue = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+        self.scheduler = PriorityScheduler(streaming=True, max_queued=STREAM_QUEUE_SIZE)
+        self.lock = threading.Lock()
+        self.unmatched_videos = {}
+        self.unmatched_ids = set()
+        self.matched_ids = set()
+        self.metadata = {}
+        self.title_tracker = {}
+        self.dedup_index = {}
+        self.completed_ids = set()
+        self.dropped = {}
+        self.counts = Counter()
+        self.transfer_result = None
+
+    def run(self):
+        """
+        Run the pipeline to completion.
+
+        Returns:
+            bool: True if every registered video was transferred (as transfer_videos).
+        """
+        self.tracker.totals_known = False
+        if STATUS_JOURNAL_ENABLED:
+            self.completed_ids = {video_id for video_id, status in utils.STATUS_JOURNAL.statuses().items()
+                                  if status == "completed"}
+
+        transfer_thread = self._start(self._transfer, "pipeline-transfer")
+        enrich_threads = [self._start(self._enrich_worker, f"pipeline-enrich-{index}")
+                          for index in range(STREAM_ENRICH_WORKERS)]
+        register_threads = [self._start(self._register_worker, f"pipeline-register-{index}")
+                            for index in range(STREAM_REGISTER_WORKERS)]
+        crawl_threads = [self._start(self._crawl_videos, "pipeline-crawl-aliyun"),
+                         self._start(self._crawl_valid_ids, "pipeline-crawl-valid-ids")]
+
+        # Shut the stages down in order as each one's upstream finishes
+        self._finish(crawl_threads, self.enrich_queue, len(enrich_threads))
+        self._finish(enrich_threads, self.register_queue, len(register_threads))
+        self._finish(register_threads)
+        self.scheduler.close()
+        self.tracker.totals_known = True
+        print(f"Streaming metadata done: {len(self.matched_ids)} matched, {self.counts['enrich_failed']} failed "
+              f"enrichment, {self.counts['register_failed']} failed registration, {self.counts['already_completed']} "
+              f"already completed, {self.counts['registered']} queued for transfer, {len(self.unmatched_videos)} videos "
+              f"and {len(self.unmatched_ids)} valid IDs unmatched.")
+        if self.dropped and self.enable_notifications:
+            utils.send_sns_notification(failed_video_id=sorted(self.dropped))
+
+        # Keep the final metadata file and S3 snapshot in step with the batch workflow
+        with open(FINAL_METADATA_LOCAL_PATH, "w", encoding="utf-8") as f:
+            json.dump(self.metadata, f, ensure_ascii=False, indent=2)
+        utils.save_metadata_to_s3(self.metadata)
+
+        transfer_thread.join()
+        return self.transfer_result
+
+    def _start(self, target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        return thread
+
+    def _finish(self, threads, downstream=None, downstream_workers=0):
+        for thread in threads:
+            thread.join()
+        for _ in range(downstream_workers):
+            downstream.put(PIPELINE_DONE)
+
+    def _transfer(self):
+        self.transfer_result = utils.transfer_videos(self.enable_notifications, self.tracker, self.scheduler)
+
+    def _crawl_videos(self):
+        for videos in iter_video_pages():
+            for video in videos:
+                self._match(video["VideoId"], video)
+
+    def _crawl_valid_ids(self):
+        for video_ids in iter_valid_id_pages():
+            for video_id in video_ids:
+                self._match(video_id)
+
+    def _match(self, video_id, video=None):
+        """Join the two crawls: a video goes downstream once it is seen in both."""
+        with self.lock:
+            if video_id in self.matched_ids:
+                return
+            if video is None:
+                video = self.unmatched_videos.pop(video_id, None)
+                if video is None:
+                    self.unmatched_ids.add(video_id)
+                    return
+            elif video_id in self.unmatched_ids:
+                self.unmatched_ids.discard(video_id)
+            else:
+                self.unmatched_videos[video_id] = video
+                return
+            self.matched_ids.add(video_id)
+        # Blocks while the enrichment stage is behind
+        self.enrich_queue.put(video)
+
+    def _enrich_worker(self):
+        while True:
+            video = self.enrich_queue.get()
+            if video is PIPELINE_DONE:
+                break
+            try:
+                if self._enrich(video):
+                    self.register_queue.put(video)
+                    continue
+            except Exception as e:
+                print(f"Unexpected error enriching video {video.get('VideoId')}: {e}")
+            self._drop(video, "enrich_failed")
+
+    def _enrich(self, video):
+        """Add the object key, mezzanine info, final URL, unique title and dedup fields. Returns False on failure."""
+        video_id = video["VideoId"]
+        object_key = utils.generate_lesson_video_ids(video_id)
+        # Lookups return None (or a (None, None) tuple) on errors
+        if not isinstance(object_key, str):
+            print(f"No object key for VideoId {video_id}, skipping.")
+            return False
+
+        mezzanine = utils.fetch_mezzanine_details(video_id)
+        file_url = mezzanine.get("FileURL")
+        if not file_url:
+            print(f"Failed to fetch FileURL for VideoId {video_id}.")
+            if self.enable_notifications:
+                utils.send_sns_notification(failed_video_id=video_id)
+            return False
+
+        video["object_key"] = object_key
+        video["FileURL"] = file_url
+        video["SourceSize"] = mezzanine.get("Size", video.get("Size", 0))
+        video["SourceChecksum"] = mezzanine.get("CRC64") or mezzanine.get("ETag") or ""
+        try:
+            video["FinalDownloadURL"] = utils.generate_final_download_url(file_url, video.get("StorageLocation"))
+        except ValueError as e:
+            print(f"Skipping video {video_id}: {e}")
+            return False
+
+        with self.lock:
+            video["unique_title"] = unique_title(video, self.title_tracker)
+            # First video with a given source file is the original, later ones are copied within S3
+            identity = utils.source_identity(video)
+            if identity is not None:
+                original_id = self.dedup_index.setdefault(identity, video_id)
+                if original_id != video_id:
+                    video["DuplicateOf"] = original_id
+                    video["DuplicateSourceKey"] = self.metadata[original_id]["object_key"]
+            self.metadata[video_id] = video
+        return True
+
+    def _register_worker(self):
+        while True:
+            video = self.register_queue.get()
+            if video is PIPELINE_DONE:
+                break
+            video_id = video["VideoId"]
+            try:
+                if video_id in self.completed_ids or not utils.register_video(video_id, video):
+                    with self.lock:
+                        self.counts["already_completed"] += 1
+                    continue
+            except Exception as e:
+                print(f"Error registering video {video_id} in DynamoDB: {e}")
+                self._drop(video, "register_failed")
+                continue
+
+            record = VideoRecord.from_aliyun(video_id, video)
+            self.tracker.add_video(record.size_mb)
+            with self.lock:
+                self.counts["registered"] += 1
+            # Blocks while STREAM_QUEUE_SIZE videos are already waiting for a transfer worker
+            self.scheduler.add(record)
+
+    def _drop(self, video, reason):
+        """Count a matched video that cannot be transferred in this run towards the totals."""
+        with self.lock:
+            self.dropped[video["VideoId"]] = reason
+            self.counts[reason] += 1
+        self.tracker.add_video(round(video.get("Size", 0) / (1024 * 1024), 2))
@@ -0,0 +1,158 @@
+import json
+import re
+from datetime import datetime
+from functools import lru_cache
+from constants import *
+
+# Compiled once instead of on every record
+TITLE_INVALID_CHARACTERS = re.compile(r"[^a-zA-Z0-9\u4e00-\u9fff]+")
+TIME_INVALID_CHARACTERS = re.compile(r"[^a-zA-Z0-9]+")
+CREATE_TIME_FORMAT = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}")
+
+# S3 tag values: &, <, >, \ and ASCII control characters (0-31, 127) become underscores
+TAG_VALUE_TRANSLATION = str.maketrans({char: "_" for char in "&<>\\" + "".join(map(chr, range(32))) + chr(127)})
+TAG_VALUE_MAX_LENGTH = 128
+
+
+class PreparedVideo:
+    """What the DynamoDB load needs for one video, built by prepare_catalogue."""
+
+    __slots__ = ("video_id", "unique_title", "item")
+
+    def __init__(self, video_id, unique_title, item):
+        self.video_id = video_id
+        self.unique_title = unique_title
+        self.item = item
+
+
+def bytes_to_mb(bytes_size):
+    """Convert bytes to MB with 2 decimal places."""
+    return round(bytes_size / (1024 * 1024), 2)
+
+
+def seconds_to_hms(seconds):
+    """Convert seconds to h:m:s format."""
+    hours = seconds // 3600
+    minutes = (seconds % 3600) // 60
+    seconds = seconds % 60
+    return f"{hours:02}:{minutes:02}:{seconds:02}"
+
+
+@lru_cache(maxsize=PREPARE_TIME_CACHE_SIZE)
+def format_creation_time(creation_time):
+    """
+    Format an Aliyun "YYYY-MM-DD HH:MM:SS" CreateTime as "YYYY_MM_DDTHH_MM_SS" for file names;
+    anything else has its special characters replaced with underscores.
+    """
+    if CREATE_TIME_FORMAT.fullmatch(creation_time):
+        # Slicing the fixed-width fields is much cheaper than strptime + strftime
+        return (f"{creation_time[0:4]}_{creation_time[5:7]}_{creation_time[8:10]}"
+                f"T{creation_time[11:13]}_{creation_time[14:16]}_{creation_time[17:19]}")
+    try:
+        return datetime.strptime(creation_time, "%Y-%m-%d %H:%M:%S").strftime("%Y_%m_%dT%H_%M_%S")
+    except ValueError:
+        return TIME_INVALID_CHARACTERS.sub("_", creation_time)
+
+
+def unique_title(video, title_tracker):
+    """
+    Build a unique "<title>_<creation time>.mp4" file name for a video.
+
+    Args:
+        video (dict): Video metadata with Title and CreateTime.
+        title_tracker (dict): Base names seen so far -> count, shared across the catalogue.
+
+    Returns:
+        str: The unique title.
+    """
+    cleaned_title = TITLE_INVALID_CHARACTERS.sub("_", video.get("Title", "untitled"))
+    base_key = f"{cleaned_title}_{format_creation_time(video.get('CreateTime', 'unknown'))}"
+
+    # Resolve duplicates by adding an ordering number
+    count = title_tracker.get(base_key, 0) + 1
+    title_tracker[base_key] = count
+    if count > 1:
+        return f"{base_key}_{count}.mp4"
+    return f"{base_key}.mp4"
+
+
+def sanitize_tag_value(value):
+    """Truncate a tag value to 128 characters and replace the characters S3 rejects."""
+    return str(value)[:TAG_VALUE_MAX_LENGTH].translate(TAG_VALUE_TRANSLATION).strip()
+
+
+def build_tags(title, size_mb, create_time):
+    """S3 tag set of a video (Title, Size_MB, CreateTime), sanitized."""
+    return [
+        {"Key": "Title", "Value": sanitize_tag_value(title)},
+        {"Key": "Size_MB", "Value": str(size_mb)},  # A number never needs sanitizing
+        {"Key": "CreateTime", "Value": sanitize_tag_value(create_time)},
+    ]
+
+
+def dynamodb_item(video_id, video):
+    """DynamoDB item of a video with initial transfer status, size in MB and duration in h:m:s format."""
+    get = video.get
+    item = {
+        "video_id": {"S": video_id},                                 # Outer key as primary key
+        "Transfer_Status": {"S": "pending"},                         # Default status
+        "Transfer_Time": {"N": "0"},                                 # Default transfer time (seconds)
+        "FileURL": {"S": get("FileURL", "")},                        # Video file URL
+        "FinalDownloadURL": {"S": get("FinalDownloadURL", "")},      # Final download URL from metadata
+        "Title": {"S": get("Title", "")},                            # Video title
+        "unique_title": {"S": get("unique_title", "")},              # Unique title field
+        "Size_MB": {"N": str(bytes_to_mb(get("Size", 0)))},          # File size in MB
+        "Duration_HMS": {"S": seconds_to_hms(get("Duration", 0))},   # Duration in h:m:s format
+        "CateId": {"N": str(get("CateId", 0))},                      # Category ID
+        "CateName": {"S": get("CateName", "")},                      # Category name
+        "AppId": {"S": get("AppId", "")},                            # Application ID
+        "Status": {"S": get("Status", "")},                          # Video status
+        "ModifyTime": {"S": get("ModifyTime", "")},                  # Last modified time
+        "CreateTime": {"S": get("CreateTime", "")},                  # Creation time
+        "CoverURL": {"S": get("CoverURL", "")},                      # Cover image URL
+        "Snapshots": {"S": json.dumps(get("Snapshots", {}).get("Snapshot", []))},  # Snapshots (JSON string)
+        "StorageLocation": {"S": get("StorageLocation", "")},        # Storage location
+        "ObjectKey": {"S": get("object_key", "")},                   # Object key
+    }
+
+    # Duplicates of another video's source file are copied within S3
+    if get("DuplicateOf"):
+        item["DuplicateOf"] = {"S": video["DuplicateOf"]}
+        item["DuplicateSourceKey"] = {"S": get("DuplicateSourceKey", "")}
+    return item
+
+
+def assign_unique_titles(metadata, object_keys=None, title_tracker=None):
+    """
+    Set unique_title (and object_key, when known) on every video of the catalogue in one pass.
+
+    Args:
+        metadata (dict): video_id -> video metadata, updated in place.
+        object_keys (dict): video_id -> object key.
+        title_tracker (dict): Base names already used, e.g. by an earlier batch.
+    """
+    title_tracker = {} if title_tracker is None else title_tracker
+    object_keys = object_keys or {}
+    for video_id, video in metadata.items():
+        video["unique_title"] = unique_title(video, title_tracker)
+        object_key = object_keys.get(video_id)
+        if object_key:
+            video["object_key"] = object_key
+
+
+def prepare_catalogue(metadata):
+    """
+    Prepare the final metadata of the whole catalogue in one pass: unique titles (kept when
+    already assigned) and DynamoDB items. S3 tags are built at upload time (build_tags), from
+    the VideoRecord the transfer works on.
+
+    Returns:
+        list: PreparedVideo per video, in catalogue order.
+    """
+    title_tracker = {}
+    prepared = []
+    for video_id, video in metadata.items():
+        title = video.get("unique_title") or unique_title(video, title_tracker)
+        video["unique_title"] = title
+        prepared.append(PreparedVideo(video_id, title, dynamodb_item(video_id, video)))
+    return prepared
@@ -0,0 +1,211 @@
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from constants import *
+
+# Leave the profiler's own allocations out of the reports
+PROFILER_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+)
+
+
+def _thread_cpu_ticks(native_id):
+    """User + system CPU ticks of a thread from /proc, or None where that is not available."""
+    try:
+        with open(f"/proc/self/task/{native_id}/stat", "rb") as f:
+            fields = f.read().rsplit(b")", 1)[1].split()
+        return int(fields[11]) + int(fields[12])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _collapse(frame):
+    """Collapsed stack (root first, ";"-separated) of a frame, as used by flamegraph tools."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """
+    Sampling CPU profiler: a background thread that reads the stacks of all other threads every
+    PROFILE_SAMPLE_INTERVAL_SECONDS. Where per-thread CPU times can be read from /proc, only
+    threads that used CPU since the previous sample are counted, so idle waits (network, locks)
+    do not dominate the profile.
+    """
+
+    def __init__(self, samples, interval=None):
+        self.samples = samples
+        self.interval = interval or PROFILE_SAMPLE_INTERVAL_SECONDS
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.cpu_ticks = {}
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            threads = {thread.ident: thread for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                thread = threads.get(ident)
+                if thread is not None and not self._used_cpu(thread):
+                    continue
+                name = thread.name if thread is not None else str(ident)
+                self.samples[f"{name};{_collapse(frame)}"] += 1
+
+    def _used_cpu(self, thread):
+        ticks = _thread_cpu_ticks(thread.native_id)
+        if ticks is None:
+            return True
+        previous = self.cpu_ticks.get(thread.native_id)
+        self.cpu_ticks[thread.native_id] = ticks
+        return previous is not None and ticks > previous
+
+
+class AllocationSampler:
+    """
+    Allocation profiler that traces in short windows: tracemalloc runs for
+    PROFILE_TRACEMALLOC_WINDOW_SECONDS out of every PROFILE_TRACEMALLOC_INTERVAL_SECONDS (the first
+    window opens with the stage), so its overhead is limited to that share of the stage. At the
+    end of each window the blocks allocated during it and still alive are added to `allocations`
+    (site -> (size, count)), and the window's peak traced memory is kept.
+    """
+
+    def __init__(self, allocations, window=None, interval=None):
+        self.allocations = allocations
+        self.window = window or PROFILE_TRACEMALLOC_WINDOW_SECONDS
+        self.interval = max(interval or PROFILE_TRACEMALLOC_INTERVAL_SECONDS, self.window)
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.windows = 0
+        self.traced_seconds = 0.0
+        self.peak_bytes = 0
+
+    def start(self):
+        if tracemalloc.is_tracing():
+            print("tracemalloc is already tracing, skipping allocation windows.")
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="allocation-sampler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def _run(self):
+        while True:
+            started = time.perf_counter()
+            tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+            stopped = self.stop_event.wait(self.window)
+            snapshot = tracemalloc.take_snapshot()
+            self.peak_bytes = max(self.peak_bytes, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            self.traced_seconds += time.perf_counter() - started
+            self.windows += 1
+
+            # Summarised after tracing stops, so the summary itself is neither traced nor slowed down
+            for statistic in snapshot.filter_traces(PROFILER_FILTERS).statistics("lineno"):
+                site = str(statistic.traceback[0])
+                size, count = self.allocations.get(site, (0, 0))
+                self.allocations[site] = (size + statistic.size, count + statistic.count)
+            if stopped or self.stop_event.wait(self.interval - self.window):
+                return
+
+
+class StageProfiler:
+    """
+    Profiles the chosen pipeline stages of a run (see PROFILE_STAGES).
+
+    Inside `stage(name)` a stack sampler runs and, with `memory`, an AllocationSampler traces
+    allocations in periodic windows; a stage may be entered several times and its results
+    accumulate. After each stage the reports in `output_dir` are rewritten:
+        <stage>.collapsed          sampled stacks, for flamegraph.pl / speedscope
+        <stage>_allocations.txt    top allocation sites by size and the peak traced memory (with `memory`)
+    Stages not enabled run with no profiling overhead.
+    """
+
+    def __init__(self, stages=(), output_dir=None, memory=False):
+        self.stages = set(stages)
+        self.memory = memory
+        self.output_dir = output_dir or os.path.join(PROFILE_OUTPUT_DIR, time.strftime("%Y%m%d-%H%M%S"))
+        self.samples = {}
+        self.allocations = {}
+        self.peak_bytes = {}
+        self.traced = {}
+        self.seconds = Counter()
+        self.files = []
+
+    @contextmanager
+    def stage(self, name):
+        if name not in self.stages:
+            yield
+            return
+
+        sampler = StackSampler(self.samples.setdefault(name, Counter()))
+        allocation_sampler = AllocationSampler(self.allocations.setdefault(name, {})) if self.memory else None
+        start = time.perf_counter()
+        sampler.start()
+        if allocation_sampler is not None:
+            allocation_sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            if allocation_sampler is not None:
+                allocation_sampler.stop()
+                self.peak_bytes[name] = max(self.peak_bytes.get(name, 0), allocation_sampler.peak_bytes)
+                windows, traced_seconds = self.traced.get(name, (0, 0.0))
+                self.traced[name] = (windows + allocation_sampler.windows,
+                                     traced_seconds + allocation_sampler.traced_seconds)
+            self.seconds[name] += time.perf_counter() - start
+            self.write_reports(name)
+
+    def write_reports(self, name):
+        """Write the collapsed stacks and (with `memory`) the top-allocation report of one stage."""
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        stacks_path = os.path.join(self.output_dir, f"{name}.collapsed")
+        with open(stacks_path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples[name].most_common():
+                f.write(f"{stack} {count}\n")
+        paths = [stacks_path]
+
+        if self.memory:
+            allocations_path = os.path.join(self.output_dir, f"{name}_allocations.txt")
+            top = sorted(self.allocations[name].items(), key=lambda item: item[1][0], reverse=True)
+            windows, traced_seconds = self.traced[name]
+            with open(allocations_path, "w", encoding="utf-8") as f:
+                f.write(f"Stage: {name}\n")
+                f.write(f"Wall time: {self.seconds[name]:.2f}s, samples: {sum(self.samples[name].values())}\n")
+                f.write(f"Allocation windows: {windows}, traced {traced_seconds:.2f}s\n")
+                f.write(f"Peak traced memory in a window: {self.peak_bytes[name] / (1024 * 1024):.2f} MB\n\n")
+                f.write(f"Top {PROFILE_TOP_ALLOCATIONS} allocation sites by size still allocated at window end:\n")
+                for site, (size, count) in top[:PROFILE_TOP_ALLOCATIONS]:
+                    f.write(f"{size / 1024:12.1f} KiB {count:10d} blocks  {site}\n")
+            paths.append(allocations_path)
+
+        for path in paths:
+            if path not in self.files:
+                self.files.append(path)
+        print(f"Profile of stage '{name}' written to {self.output_dir}")
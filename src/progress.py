@@ -0,0 +1,97 @@
+import threading
+import time
+from constants import *
+
+
+class ProgressTracker:
+    """
+    In-process transfer progress: completed videos and MB against the totals,
+    with an exponential moving average of the MB/s rate for the ETA.
+    """
+
+    def __init__(self, total_videos, total_mb, completed_videos=0, completed_mb=0.0):
+        self.lock = threading.Lock()
+        self.total_videos = total_videos
+        self.total_mb = total_mb
+        self.completed_videos = completed_videos
+        self.completed_mb = completed_mb
+        self.rate_mb_per_s = 0.0
+        self.last_update = time.monotonic()
+        # False while the streaming pipeline is still discovering videos
+        self.totals_known = True
+
+    @classmethod
+    def from_records(cls, records):
+        """Build a tracker from VideoRecords."""
+        return cls(len(records), sum(record.size_mb for record in records))
+
+    def add_video(self, size_mb):
+        """Add one video of `size_mb` MB to the totals (streaming mode discovers videos as it goes)."""
+        with self.lock:
+            self.total_videos += 1
+            self.total_mb += size_mb
+
+    def record_completed(self, size_mb):
+        """Count one completed video of `size_mb` MB and update the moving-average rate."""
+        with self.lock:
+            now = time.monotonic()
+            elapsed = max(now - self.last_update, 1e-6)
+            self.last_update = now
+            self.completed_videos += 1
+            self.completed_mb += size_mb
+
+            instant_rate = size_mb / elapsed
+            if self.rate_mb_per_s:
+                self.rate_mb_per_s += PROGRESS_RATE_SMOOTHING * (instant_rate - self.rate_mb_per_s)
+            else:
+                self.rate_mb_per_s = instant_rate
+
+    @property
+    def percentage(self):
+        """Byte-weighted completion percentage (falls back to video count without sizes)."""
+        with self.lock:
+            if self.total_mb > 0:
+                return min(100.0, self.completed_mb / self.total_mb * 100)
+            if self.total_videos:
+                return self.completed_videos / self.total_videos * 100
+            return 100.0
+
+    @property
+    def eta_seconds(self):
+        """Seconds until completion at the current moving-average rate, or None if unknown."""
+        with self.lock:
+            remaining_mb = max(self.total_mb - self.completed_mb, 0.0)
+            if not remaining_mb:
+                return 0.0
+            if not self.rate_mb_per_s:
+                return None
+            return remaining_mb / self.rate_mb_per_s
+
+    @property
+    def is_complete(self):
+        with self.lock:
+            return self.completed_videos >= self.total_videos
+
+    def summary(self):
+        """One-line progress summary for logs and notifications."""
+        percentage = self.percentage
+        eta = format_duration(self.eta_seconds)
+        with self.lock:
+            if not self.totals_known:
+                return (
+                    f"Completed videos: {self.completed_videos}/{self.total_videos} so far (catalogue still streaming), "
+                    f"{self.completed_mb:.2f}/{self.total_mb:.2f} MB, {self.rate_mb_per_s:.2f} MB/s"
+                )
+            return (
+                f"Completed videos: {self.completed_videos}/{self.total_videos}, "
+                f"{self.completed_mb:.2f}/{self.total_mb:.2f} MB ({percentage:.1f}%), "
+                f"{self.rate_mb_per_s:.2f} MB/s, ETA {eta}"
+            )
+
+
+def format_duration(seconds):
+    """Format seconds as h:m:s ("unknown" for None)."""
+    if seconds is None:
+        return "unknown"
+    seconds = int(seconds)
+    return f"{seconds // 3600:02}:{(seconds % 3600) // 60:02}:{seconds % 60:02}"
@@ -0,0 +1,218 @@
+"""
+Reconcile the transferred videos in AWS_VIDEO_BUCKET against the DynamoDB table.
+
+Streams a paginated ListObjectsV2 listing of the lesson/ prefix and a parallel scan of the
+table (spilled to an on-disk SQLite index), then merges both by object key in one sorted pass:
+  - missing:    in the table but not in S3
+  - mismatched: in both, but the sizes differ or the status is not "completed"
+  - orphaned:   in S3 but not in the table
+
+Usage:
+    python reconcile.py
+    python reconcile.py --requeue --output-dir /home/ubuntu/reconcile
+"""
+import argparse
+import json
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+from constants import *
+from config import *
+from utils import STATUS_JOURNAL, update_video_status
+
+SCAN_DONE = object()
+
+
+def iter_s3_objects(prefix=RECONCILE_PREFIX):
+    """Yield (key, size in bytes) for every object under `prefix`, in key order."""
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=AWS_VIDEO_BUCKET, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            yield obj["Key"], obj["Size"]
+
+
+def scan_segment(segment, total_segments, rows, errors):
+    """
+    Scan one segment of the table and put (key, video_id, size_mb, status) tuples on `rows`.
+    A failed scan is appended to `errors` as (segment, exception) for load_table_index to raise.
+    """
+    scan_kwargs = {
+        "TableName": DYNAMODB_TABLE,
+        "Segment": segment,
+        "TotalSegments": total_segments,
+        "ProjectionExpression": "#video_id, #ObjectKey, #Size_MB, #Transfer_Status",
+        "ExpressionAttributeNames": {
+            "#video_id": "video_id",
+            "#ObjectKey": "ObjectKey",
+            "#Size_MB": "Size_MB",
+            "#Transfer_Status": "Transfer_Status",
+        },
+    }
+    try:
+        while True:
+            response = dynamodb_client.scan(**scan_kwargs)
+            for item in response.get("Items", []):
+                object_key = item.get("ObjectKey", {}).get("S", "")
+                rows.put((
+                    f"{object_key}.mp4" if object_key else "",
+                    item["video_id"]["S"],
+                    float(item.get("Size_MB", {}).get("N", 0)),
+                    item.get("Transfer_Status", {}).get("S", ""),
+                ))
+            if "LastEvaluatedKey" not in response:
+                break
+            scan_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    except Exception as e:
+        print(f"Scan of segment {segment}/{total_segments} failed: {e}")
+        errors.append((segment, e))
+    finally:
+        rows.put(SCAN_DONE)
+
+
+def load_table_index(connection, total_segments=RECONCILE_SCAN_SEGMENTS):
+    """
+    Parallel-scan the table into an on-disk SQLite index ordered by object key.
+    If any segment fails, its exception is raised once every scan has finished: a partial index
+    would report the lost segment's objects as orphaned.
+
+    Returns:
+        int: The number of items indexed.
+    """
+    connection.execute("CREATE TABLE videos (key TEXT, video_id TEXT, size_mb REAL, status TEXT)")
+    rows = queue.Queue(maxsize=RECONCILE_BATCH_SIZE * total_segments)
+    errors = []
+    threads = [
+        threading.Thread(target=scan_segment, args=(segment, total_segments, rows, errors), daemon=True)
+        for segment in range(total_segments)
+    ]
+    for thread in threads:
+        thread.start()
+
+    indexed = 0
+    finished = 0
+    batch = []
+    while finished < total_segments:
+        row = rows.get()
+        if row is SCAN_DONE:
+            finished += 1
+            continue
+        batch.append(row)
+        if len(batch) >= RECONCILE_BATCH_SIZE:
+            connection.executemany("INSERT INTO videos VALUES (?, ?, ?, ?)", batch)
+            indexed += len(batch)
+            batch = []
+    connection.executemany("INSERT INTO videos VALUES (?, ?, ?, ?)", batch)
+    indexed += len(batch)
+
+    for thread in threads:
+        thread.join()
+    if errors:
+        segment, error = errors[0]
+        raise RuntimeError(f"{len(errors)} of {total_segments} scan segments failed, "
+                           f"first segment {segment}: {error}") from error
+    connection.execute("CREATE INDEX videos_key ON videos (key)")
+    connection.commit()
+    return indexed
+
+
+def merge_sorted(s3_objects, table_rows):
+    """
+    Merge two key-ordered streams and yield (category, details) for every discrepancy.
+    `s3_objects` yields (key, size_bytes); `table_rows` yields (key, video_id, size_mb, status).
+    """
+    s3_iter = iter(s3_objects)
+    table_iter = iter(table_rows)
+    s3_object = next(s3_iter, None)
+    table_row = next(table_iter, None)
+
+    while s3_object is not None or table_row is not None:
+        if table_row is not None and (s3_object is None or table_row[0] < s3_object[0]):
+            key, video_id, size_mb, status = table_row
+            yield "missing", {"key": key, "video_id": video_id, "size_mb": size_mb, "status": status}
+            table_row = next(table_iter, None)
+
+        elif table_row is None or s3_object[0] < table_row[0]:
+            key, size_bytes = s3_object
+            yield "orphaned", {"key": key, "s3_size_mb": round(size_bytes / (1024 * 1024), 2)}
+            s3_object = next(s3_iter, None)
+
+        else:
+            # Same key: every table row for it is compared with the one object
+            key, size_bytes = s3_object
+            s3_size_mb = round(size_bytes / (1024 * 1024), 2)
+            while table_row is not None and table_row[0] == key:
+                _, video_id, size_mb, status = table_row
+                reasons = []
+                if abs(s3_size_mb - size_mb) > RECONCILE_SIZE_TOLERANCE_MB:
+                    reasons.append("size")
+                if status != "completed":
+                    reasons.append("status")
+                if reasons:
+                    yield "mismatched", {
+                        "key": key, "video_id": video_id, "size_mb": size_mb,
+                        "s3_size_mb": s3_size_mb, "status": status, "reasons": reasons,
+                    }
+                table_row = next(table_iter, None)
+            s3_object = next(s3_iter, None)
+
+
+def reconcile(output_dir=RECONCILE_OUTPUT_DIR, requeue=False):
+    """
+    Reconcile S3 against DynamoDB and write missing.jsonl, mismatched.jsonl and orphaned.jsonl
+    to `output_dir`. With `requeue`, missing videos and size mismatches are set back to "pending".
+
+    Returns:
+        dict: Counts per category (plus "indexed" and "requeued").
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    summary = {"indexed": 0, "missing": 0, "mismatched": 0, "orphaned": 0, "requeued": 0}
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        connection = sqlite3.connect(os.path.join(work_dir, "reconcile.db"))
+        print("Scanning DynamoDB table...")
+        try:
+            # Raises before any report is written or video requeued if the scan is incomplete
+            summary["indexed"] = load_table_index(connection)
+        except Exception:
+            connection.close()
+            raise
+        print(f"Indexed {summary['indexed']} items. Merging with the S3 listing...")
+
+        table_rows = connection.execute("SELECT key, video_id, size_mb, status FROM videos ORDER BY key")
+        outputs = {
+            category: open(os.path.join(output_dir, f"{category}.jsonl"), "w", encoding="utf-8")
+            for category in ("missing", "mismatched", "orphaned")
+        }
+        try:
+            for category, details in merge_sorted(iter_s3_objects(), table_rows):
+                outputs[category].write(json.dumps(details, ensure_ascii=False) + "\n")
+                summary[category] += 1
+
+                if requeue and "video_id" in details and (category == "missing" or "size" in details.get("reasons", [])):
+                    update_video_status(details["video_id"], "pending")
+                    summary["requeued"] += 1
+        finally:
+            for output in outputs.values():
+                output.close()
+            connection.close()
+
+    if summary["requeued"] and STATUS_JOURNAL_ENABLED:
+        STATUS_JOURNAL.flush()
+
+    print(f"Reconciliation: {summary['missing']} missing, {summary['mismatched']} mismatched, "
+          f"{summary['orphaned']} orphaned, {summary['requeued']} requeued. Reports in {output_dir}")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reconcile S3 video objects against the DynamoDB table.")
+    parser.add_argument("--output-dir", default=RECONCILE_OUTPUT_DIR, help="Folder for the JSONL reports.")
+    parser.add_argument("--requeue", action="store_true", help="Set missing and size-mismatched videos to pending.")
+    args = parser.parse_args(argv)
+    reconcile(args.output_dir, args.requeue)
+
+
+if __name__ == "__main__":
+    main()
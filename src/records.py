@@ -0,0 +1,150 @@
+import calendar
+import time
+
+
+def _attribute(item, key, default=""):
+    """Read a value from a DynamoDB item ({"S": ...}/{"N": ...}) or a plain dict."""
+    value = item.get(key)
+    if value is None:
+        return default
+    if isinstance(value, dict):
+        return next(iter(value.values()), default)
+    return value
+
+
+def _parse_create_time(create_time):
+    """Parse an Aliyun "YYYY-MM-DD HH:MM:SS" (UTC) timestamp to epoch seconds, 0 if unknown."""
+    try:
+        return calendar.timegm(time.strptime(create_time, "%Y-%m-%d %H:%M:%S"))
+    except (TypeError, ValueError):
+        return 0
+
+
+class VideoRecord:
+    """
+    Compact record of one video with only the fields the transfer pipeline needs.
+
+    Built once from the Aliyun metadata JSON or a DynamoDB item, instead of carrying
+    the full payload (Snapshots, cover URLs, ...) or DynamoDB-typed wrappers around.
+    """
+
+    __slots__ = (
+        "video_id",
+        "title",
+        "unique_title",
+        "object_key",
+        "download_url",
+        "storage_location",
+        "size_mb",
+        "create_time",
+        "create_ts",
+        "transfer_status",
+        "duplicate_of",
+        "duplicate_source_key",
+        "retry_count",
+    )
+
+    # DynamoDB attributes read by from_dynamodb, for scans with a ProjectionExpression
+    DYNAMODB_ATTRIBUTES = (
+        "video_id",
+        "Title",
+        "unique_title",
+        "ObjectKey",
+        "FinalDownloadURL",
+        "StorageLocation",
+        "Size_MB",
+        "CreateTime",
+        "Transfer_Status",
+        "DuplicateOf",
+        "DuplicateSourceKey",
+        "Retry_Count",
+    )
+
+    def __init__(self, video_id, title="", unique_title="", object_key="", download_url="",
+                 storage_location="", size_mb=0.0, create_time="", transfer_status="pending",
+                 duplicate_of="", duplicate_source_key="", retry_count=0):
+        self.video_id = video_id
+        self.title = title
+        self.unique_title = unique_title
+        self.object_key = object_key
+        self.download_url = download_url
+        self.storage_location = storage_location
+        self.size_mb = size_mb
+        self.create_time = create_time
+        self.create_ts = _parse_create_time(create_time)
+        self.transfer_status = transfer_status
+        self.duplicate_of = duplicate_of
+        self.duplicate_source_key = duplicate_source_key
+        self.retry_count = retry_count  # Transfer retries so far, stored as Retry_Count
+
+    def __repr__(self):
+        return f"VideoRecord({self.video_id!r}, {self.transfer_status!r}, {self.size_mb} MB)"
+
+    @classmethod
+    def from_aliyun(cls, video_id, video):
+        """Build a record from one entry of the (final) Aliyun metadata JSON."""
+        return cls(
+            video_id=video_id,
+            title=video.get("Title", ""),
+            unique_title=video.get("unique_title", ""),
+            object_key=video.get("object_key", ""),
+            download_url=video.get("FinalDownloadURL", ""),
+            storage_location=video.get("StorageLocation", ""),
+            size_mb=round(video.get("Size", 0) / (1024 * 1024), 2),
+            create_time=video.get("CreateTime", ""),
+            duplicate_of=video.get("DuplicateOf", ""),
+            duplicate_source_key=video.get("DuplicateSourceKey", ""),
+        )
+
+    @classmethod
+    def from_dynamodb(cls, item):
+        """Build a record from a DynamoDB item (typed or plain values)."""
+        return cls(
+            video_id=_attribute(item, "video_id", "unknown_id"),
+            title=_attribute(item, "Title", "Untitled"),
+            unique_title=_attribute(item, "unique_title"),
+            object_key=_attribute(item, "ObjectKey"),
+            download_url=_attribute(item, "FinalDownloadURL"),
+            storage_location=_attribute(item, "StorageLocation"),
+            size_mb=float(_attribute(item, "Size_MB", 0) or 0),
+            create_time=_attribute(item, "CreateTime"),
+            transfer_status=_attribute(item, "Transfer_Status", "pending"),
+            duplicate_of=_attribute(item, "DuplicateOf"),
+            duplicate_source_key=_attribute(item, "DuplicateSourceKey"),
+            retry_count=int(_attribute(item, "Retry_Count", 0) or 0),
+        )
+
+    def to_aliyun(self):
+        """Aliyun-style metadata dict (the subset this record keeps)."""
+        return {
+            "VideoId": self.video_id,
+            "Title": self.title,
+            "unique_title": self.unique_title,
+            "object_key": self.object_key,
+            "FinalDownloadURL": self.download_url,
+            "StorageLocation": self.storage_location,
+            "Size": int(self.size_mb * 1024 * 1024),
+            "CreateTime": self.create_time,
+            "DuplicateOf": self.duplicate_of,
+            "DuplicateSourceKey": self.duplicate_source_key,
+        }
+
+    def to_dynamodb(self):
+        """DynamoDB item holding the attributes this record keeps."""
+        item = {
+            "video_id": {"S": self.video_id},
+            "Title": {"S": self.title},
+            "unique_title": {"S": self.unique_title},
+            "ObjectKey": {"S": self.object_key},
+            "FinalDownloadURL": {"S": self.download_url},
+            "StorageLocation": {"S": self.storage_location},
+            "Size_MB": {"N": str(self.size_mb)},
+            "CreateTime": {"S": self.create_time},
+            "Transfer_Status": {"S": self.transfer_status},
+        }
+        if self.duplicate_of:
+            item["DuplicateOf"] = {"S": self.duplicate_of}
+            item["DuplicateSourceKey"] = {"S": self.duplicate_source_key}
+        if self.retry_count:
+            item["Retry_Count"] = {"N": str(self.retry_count)}
+        return item
@@ -0,0 +1,230 @@
+import bisect
+import json
+import os
+import threading
+import time
+from collections import deque
+from itertools import islice
+from constants import *
+
+# Lanes in priority order; "urgent" is the fast lane for re-requests
+LANES = ("urgent", "high", "recent", "archive")
+
+
+def lesson_id_of(record):
+    """Lesson ID from an object key of the form "lesson/<lesson_id>/<video_id>"."""
+    parts = record.object_key.split("/")
+    return parts[1] if len(parts) >= 3 and parts[0] == "lesson" else ""
+
+
+def load_priority_list(path):
+    """
+    Load the externally supplied priority list:
+        {"urgent": [video or lesson IDs], "high": [video or lesson IDs]}
+    Returns empty sets if the file does not exist or cannot be read.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return set(data.get("urgent", [])), set(data.get("high", []))
+    except FileNotFoundError:
+        return set(), set()
+    except (OSError, ValueError) as e:
+        print(f"Error reading priority list {path}: {e}")
+        return set(), set()
+
+
+class PriorityScheduler:
+    """
+    Thread-safe multi-lane scheduler for transfer workers.
+
+    Videos are placed in a lane by the priority list (urgent/high, by video or lesson ID)
+    and otherwise by CreateTime (recent vs archive). Workers take the best lane head; a lane's
+    rank improves by one for every PRIORITY_AGING_SECONDS since it was last served, so the
+    archive backlog keeps draining. Fast-lane workers are reserved for urgent videos; otherwise they
+    borrow the first video within FAST_LANE_SCAN_DEPTH of a lane that is no larger than
+    FAST_LANE_BORROW_MAX_MB or the FAST_LANE_BORROW_PERCENTILE of the added videos' sizes, so they stay
+    busy with the shorter half of the catalogue. Duplicates wait for their original, which is queued in
+    the better of its own lane and its duplicates' lanes.
+
+    A streaming scheduler is fed one video at a time with add() while workers are running:
+    add() blocks while `max_queued` videos are waiting (backpressure), and next() keeps
+    waiting for more videos until close() is called.
+    """
+
+    def __init__(self, priority_list_path=None, streaming=False, max_queued=None):
+        self.condition = threading.Condition()
+        self.closed = not streaming
+        self.max_queued = max_queued
+        self.lanes = {lane: deque() for lane in LANES}
+        self.lane_served = {lane: time.monotonic() for lane in LANES}
+        self.lane_of = {}
+        self.queued = {}  # video_id -> record, for every video in lane_of
+        self.held = {}
+        self.in_flight = set()
+        self.sizes = []  # Sizes (MB) of every video added, sorted, for the fast-lane borrow limit
+        self.priority_list_path = priority_list_path or PRIORITY_LIST_PATH
+        self.priority_list_mtime = None
+        self.urgent_ids, self.high_ids = set(), set()
+        self.recent_cutoff = time.time() - PRIORITY_RECENT_DAYS * 86400
+        self._refresh_priority_list()
+
+    def __len__(self):
+        with self.condition:
+            return len(self.lane_of) + sum(len(videos) for videos in self.held.values())
+
+    def lane_for(self, record):
+        ids = (record.video_id, lesson_id_of(record))
+        if any(i in self.urgent_ids for i in ids):
+            return "urgent"
+        if any(i in self.high_ids for i in ids):
+            return "high"
+        if record.create_ts >= self.recent_cutoff:
+            return "recent"
+        return "archive"
+
+    def add_all(self, records):
+        """Queue videos, newest first within each lane; duplicates are held until their original is done."""
+        pending_ids = {record.video_id for record in records}
+        with self.condition:
+            self.sizes = sorted(self.sizes + [record.size_mb for record in records])
+            # Hold the duplicates first, so their lanes count when the originals are queued
+            ordered = sorted(records, key=lambda r: r.create_ts, reverse=True)
+            for record in ordered:
+                if record.duplicate_of and record.duplicate_of in pending_ids:
+                    self._hold(record)
+            for record in ordered:
+                if not (record.duplicate_of and record.duplicate_of in pending_ids):
+                    self._enqueue(record)
+            self.condition.notify_all()
+
+    def add(self, record):
+        """Queue one video, waiting while the queue is full; a duplicate is held while its original is pending."""
+        with self.condition:
+            while self.max_queued and len(self.lane_of) >= self.max_queued:
+                self.condition.wait()
+            bisect.insort(self.sizes, record.size_mb)
+            original = record.duplicate_of
+            if original and (original in self.lane_of or original in self.in_flight):
+                self._hold(record)
+            else:
+                self._enqueue(record)
+            self.condition.notify_all()
+
+    def close(self):
+        """No more videos will be added; workers stop once the queue drains."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def next(self, fast_lane=False):
+        """
+        Block until a video is available for this worker and return it.
+        Returns None once nothing is queued or held any more (and, when streaming, after close()).
+        """
+        with self.condition:
+            while True:
+                self._refresh_priority_list()
+                record = self._pop(fast_lane)
+                if record is not None:
+                    self.in_flight.add(record.video_id)
+                    # Wake up a producer waiting for queue space
+                    self.condition.notify_all()
+                    return record
+                if self.closed and not self.lane_of and not self.held:
+                    return None
+                self.condition.wait(timeout=PRIORITY_REFRESH_SECONDS)
+
+    def task_done(self, video_id):
+        """Mark a video finished and release any duplicates waiting for it."""
+        with self.condition:
+            self.in_flight.discard(video_id)
+            for record in self.held.pop(video_id, []):
+                self._enqueue(record)
+            self.condition.notify_all()
+
+    def _lane_with_held(self, record):
+        """Best of a video's own lane and the lanes of the duplicates held for it."""
+        held = self.held.get(record.video_id, [])
+        return min([self.lane_for(record)] + [self.lane_for(duplicate) for duplicate in held], key=LANES.index)
+
+    def _hold(self, record):
+        """Hold a duplicate until its original is done, moving a queued original up to the duplicate's lane."""
+        original_id = record.duplicate_of
+        self.held.setdefault(original_id, []).append(record)
+        original = self.queued.get(original_id)
+        if original is not None:
+            lane = self._lane_with_held(original)
+            if lane != self.lane_of[original_id]:
+                self._enqueue(original, lane)
+
+    def _enqueue(self, record, lane=None):
+        lane = lane or self._lane_with_held(record)
+        # A video moved to another lane leaves a stale entry behind, skipped in _pop
+        self.lane_of[record.video_id] = lane
+        self.queued[record.video_id] = record
+        self.lanes[lane].append(record)
+
+    @property
+    def borrow_max_mb(self):
+        """Largest video a fast-lane worker may borrow from the other lanes."""
+        if not self.sizes:
+            return FAST_LANE_BORROW_MAX_MB
+        index = min(len(self.sizes) - 1, len(self.sizes) * FAST_LANE_BORROW_PERCENTILE // 100)
+        return max(FAST_LANE_BORROW_MAX_MB, self.sizes[index])
+
+    def _borrowable_index(self, lane):
+        """Index of the first small enough video within FAST_LANE_SCAN_DEPTH of a lane, or None."""
+        borrow_max_mb = self.borrow_max_mb
+        for index, record in enumerate(islice(self.lanes[lane], FAST_LANE_SCAN_DEPTH)):
+            if self.lane_of.get(record.video_id) == lane and record.size_mb <= borrow_max_mb:
+                return index
+        return None
+
+    def _pop(self, fast_lane):
+        now = time.monotonic()
+        best_lane, best_rank, best_index = None, None, 0
+        for rank, lane in enumerate(LANES):
+            videos = self.lanes[lane]
+            while videos and self.lane_of.get(videos[0].video_id) != lane:
+                videos.popleft()
+            if not videos:
+                continue
+            index = 0
+            if fast_lane and lane != "urgent":
+                index = self._borrowable_index(lane)
+                if index is None:
+                    continue
+            # Anti-starvation aging: a lane gains one rank per PRIORITY_AGING_SECONDS unserved
+            effective_rank = rank - (now - self.lane_served[lane]) / PRIORITY_AGING_SECONDS
+            if lane == "urgent":
+                effective_rank = float("-inf")
+            if best_rank is None or effective_rank < best_rank:
+                best_lane, best_rank, best_index = lane, effective_rank, index
+
+        if best_lane is None:
+            return None
+        videos = self.lanes[best_lane]
+        record = videos[best_index]
+        del videos[best_index]
+        del self.lane_of[record.video_id]
+        del self.queued[record.video_id]
+        self.lane_served[best_lane] = now
+        return record
+
+    def _refresh_priority_list(self):
+        """Reload the priority list when the file changes and move affected queued videos."""
+        try:
+            mtime = os.path.getmtime(self.priority_list_path)
+        except OSError:
+            return
+        if mtime == self.priority_list_mtime:
+            return
+        self.priority_list_mtime = mtime
+        self.urgent_ids, self.high_ids = load_priority_list(self.priority_list_path)
+
+        for record in list(self.queued.values()):
+            lane = self._lane_with_held(record)
+            if lane != self.lane_of[record.video_id]:
+                self._enqueue(record, lane)
+        print(f"Priority list reloaded: {len(self.urgent_ids)} urgent, {len(self.high_ids)} high priority IDs.")
@@ -0,0 +1,206 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from constants import *
+from records import VideoRecord
+
+
+class StatusJournal:
+    """
+    Write-behind journal of transfer status transitions.
+
+    Transitions are recorded first in a local SQLite database (WAL mode) so they survive a crash,
+    one row per video: a newer transition for the same video replaces the older one before it is
+    written. A background thread flushes unwritten rows to DynamoDB in batches through `writer`
+    (a function taking the same arguments as record(), without `record`).
+
+    Each DynamoDB table gets its own journal file (see journal_path), so rows recorded against
+    one table never apply to another.
+    """
+
+    def __init__(self, writer, path=None, table=None):
+        self.writer = writer
+        self.path = path
+        self.table = table
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.connection = None
+        self.flush_event = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def _connect(self):
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path or journal_path(self.table), check_same_thread=False,
+                                              isolation_level=None)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS transitions (
+                    video_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    transfer_time TEXT,
+                    stage_times TEXT,
+                    bytes_transferred INTEGER,
+                    retry_count INTEGER,
+                    record TEXT,
+                    updated_at REAL NOT NULL,
+                    flushed INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS transitions_pending ON transitions (flushed)")
+        return self.connection
+
+    def record(self, video_id, status, transfer_time=None, stage_times=None, bytes_transferred=None,
+               retry_count=None, record=None):
+        """Record a status transition locally; it is written to DynamoDB by the flusher."""
+        with self.lock:
+            connection = self._connect()
+            connection.execute(
+                """
+                INSERT INTO transitions (video_id, status, transfer_time, stage_times, bytes_transferred,
+                                         retry_count, record, updated_at, flushed)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)
+                ON CONFLICT (video_id) DO UPDATE SET
+                    status = excluded.status,
+                    transfer_time = excluded.transfer_time,
+                    stage_times = excluded.stage_times,
+                    bytes_transferred = excluded.bytes_transferred,
+                    retry_count = COALESCE(excluded.retry_count, retry_count),
+                    record = COALESCE(excluded.record, record),
+                    updated_at = excluded.updated_at,
+                    flushed = 0
+                """,
+                (
+                    video_id,
+                    status,
+                    None if transfer_time is None else str(transfer_time),
+                    json.dumps(stage_times) if stage_times else None,
+                    bytes_transferred,
+                    retry_count,
+                    json.dumps(record.to_dynamodb(), ensure_ascii=False) if record is not None else None,
+                    time.time(),
+                ),
+            )
+            unflushed = connection.execute("SELECT COUNT(*) FROM transitions WHERE flushed = 0").fetchone()[0]
+
+        self.start()
+        if unflushed >= STATUS_FLUSH_BATCH_SIZE:
+            self.flush_event.set()
+
+    def start(self):
+        """Start the background flusher (once); it first flushes anything left from a previous run."""
+        if self.thread is None or not self.thread.is_alive():
+            with self.lock:
+                if self.thread is None or not self.thread.is_alive():
+                    self.stop_event.clear()
+                    self.thread = threading.Thread(target=self._run, name="status-journal", daemon=True)
+                    self.thread.start()
+
+    def stop(self):
+        """Stop the flusher and write every remaining transition."""
+        if self.connection is None:
+            return
+        self.stop_event.set()
+        self.flush_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.flush()
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.flush()
+            self.flush_event.wait(timeout=STATUS_FLUSH_INTERVAL_SECONDS)
+            self.flush_event.clear()
+
+    def flush(self):
+        """
+        Write unflushed transitions to DynamoDB, STATUS_FLUSH_BATCH_SIZE at a time.
+
+        Returns:
+            int: The number of transitions written.
+        """
+        written = 0
+        with self.flush_lock, ThreadPoolExecutor(max_workers=STATUS_FLUSH_WORKERS) as executor:
+            while True:
+                with self.lock:
+                    rows = self._connect().execute(
+                        """
+                        SELECT video_id, status, transfer_time, stage_times, bytes_transferred, retry_count, updated_at
+                        FROM transitions WHERE flushed = 0 ORDER BY updated_at LIMIT ?
+                        """,
+                        (STATUS_FLUSH_BATCH_SIZE,),
+                    ).fetchall()
+                if not rows:
+                    return written
+
+                results = list(executor.map(self._write, rows))
+                done = [(row[0], row[6]) for row, ok in zip(rows, results) if ok]
+                with self.lock:
+                    # Only mark rows that did not get a newer transition while being written
+                    self._connect().executemany(
+                        "UPDATE transitions SET flushed = 1 WHERE video_id = ? AND updated_at = ?", done
+                    )
+                written += len(done)
+                if len(done) < len(rows):
+                    # Leave the failed ones for the next flush cycle
+                    return written
+
+    def _write(self, row):
+        video_id, status, transfer_time, stage_times, bytes_transferred, retry_count, _ = row
+        try:
+            self.writer(video_id, status, transfer_time, json.loads(stage_times) if stage_times else None,
+                        bytes_transferred, retry_count)
+            return True
+        except Exception as e:
+            print(f"Failed to write status of video {video_id} to DynamoDB, will retry: {e}")
+            return False
+
+    def statuses(self):
+        """
+        Return {video_id: status} for the videos whose latest transition is not in DynamoDB yet.
+        Flushed rows are left out: DynamoDB has them, and may have changed them since.
+        """
+        with self.lock:
+            return dict(self._connect().execute(
+                "SELECT video_id, status FROM transitions WHERE flushed = 0"
+            ).fetchall())
+
+    def clear_flushed(self):
+        """
+        Delete the transitions already written to DynamoDB, e.g. once a migration is complete.
+
+        Returns:
+            int: The number of rows deleted.
+        """
+        with self.lock:
+            return self._connect().execute("DELETE FROM transitions WHERE flushed = 1").rowcount
+
+    def videos_with_status(self, status):
+        """
+        Return VideoRecords for the journaled videos whose latest transition is `status`,
+        with the retry count of that transition.
+        """
+        with self.lock:
+            rows = self._connect().execute(
+                "SELECT record, retry_count FROM transitions WHERE status = ? AND record IS NOT NULL", (status,)
+            ).fetchall()
+        videos = []
+        for record, retry_count in rows:
+            video = VideoRecord.from_dynamodb(json.loads(record))
+            video.retry_count = retry_count or video.retry_count
+            videos.append(video)
+        return videos
+
+
+def journal_path(table=None):
+    """Journal file of a DynamoDB table: STATUS_JOURNAL_PATH with the table name before the extension."""
+    if not table:
+        return STATUS_JOURNAL_PATH
+    root, extension = os.path.splitext(STATUS_JOURNAL_PATH)
+    return f"{root}_{table}{extension}"
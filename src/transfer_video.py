@@ -1,62 +1,91 @@
+import argparse
+import os
 import json
+import time
 from constants import *
 from config import *
 from utils import *
+from progress import ProgressTracker
+from profiling import StageProfiler
+from checkpoint import CheckpointManifest, file_sha256
+from pipeline import StreamingPipeline
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Transfer Aliyun VOD videos to S3.")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Overlap crawl, enrichment, DynamoDB registration and transfer instead of running them in turn.")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Ignore the stage checkpoints of a previous run and start from the beginning.")
+    parser.add_argument("--profile", action="store_true",
+                        help="Sample CPU stacks for the stages in --profile-stages.")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="With --profile, also trace allocations with tracemalloc in periodic windows.")
+    parser.add_argument("--profile-stages", default=",".join(PROFILE_STAGES),
+                        help=f"Comma-separated stages to profile (default: {','.join(PROFILE_STAGES)}).")
+    parser.add_argument("--profile-dir", default=None,
+                        help="Folder for the profile reports (default: a timestamped folder in PROFILE_OUTPUT_DIR).")
+    parser.add_argument("--profile-upload", action="store_true",
+                        help=f"Upload the profile reports to AWS_LOG_BUCKET under {LOG_FOLDER}/profiles/.")
+    args = parser.parse_args(argv)
+
+    args.profile_stages = [stage.strip() for stage in args.profile_stages.split(",") if stage.strip()]
+    unknown = set(args.profile_stages) - set(PROFILE_STAGES)
+    if unknown:
+        parser.error(f"unknown profile stages: {', '.join(sorted(unknown))}")
+    return args
+
+def upload_profiles(profiler):
+    """Upload the profile reports next to the logs in AWS_LOG_BUCKET."""
+    run_folder = os.path.basename(os.path.normpath(profiler.output_dir))
+    for path in profiler.files:
+        upload_log_to_s3(path, log_type=f"profiles/{run_folder}")
+
+def main(argv=None):
     """
     Main workflow for video transfer preparation and execution.
     """
-    # Step 1: Fetch and prepare metadata
-    print("Fetching metadata...")
-    metadata = fetch_all_metadata()
-    
-    print("Matching metadata against API results...")
-    matched_metadata, matched_video_ids = fetch_all_docs_and_match(metadata)
-    
-    print("Get the lesson ID for all videos...")
-    object_key = generate_lesson_video_ids(matched_video_ids)
-    
-    print("Saving metadata to local file...")
-    metadata_file = save_metadata_to_file(matched_metadata, METADATA_LOCAL_PATH, object_key)
-    
-    print("Counting videos in metadata...")
-    video_count = count_videos_in_file(metadata_file)
-    
-    print("Appending file URLs to metadata...")
-    append_file_urls_to_metadata(METADATA_LOCAL_PATH, video_count)
-    
-    print("Creating final download URLs...")
-    update_video_metadata_with_final_urls(METADATA_LOCAL_PATH, FINAL_METADATA_LOCAL_PATH) 
-    
-    print("Loading final metadata...")
-    with open(FINAL_METADATA_LOCAL_PATH, "r", encoding="utf-8") as f:
-        updated_metadata = json.load(f)
-    
-    print("Saving metadata to S3...")
-    save_metadata_to_s3(updated_metadata)
-    
-    print("Uploading metadata to DynamoDB...")
-    upload_metadata_to_dynamodb(FINAL_METADATA_LOCAL_PATH)
-    print("Metadata upload to DynamoDB completed.")
+    args = parse_args(argv)
+    profiler = StageProfiler(args.profile_stages if args.profile else (), args.profile_dir, args.profile_memory)
+    manifest = CheckpointManifest()
+    if args.no_resume:
+        manifest.reset()
+        if STATUS_JOURNAL_ENABLED:
+            # Transitions already in DynamoDB must not carry over into the fresh run
+            STATUS_JOURNAL.clear_flushed()
 
-    # Step 2: Start video transfer process
-    print("Starting video transfer process...")
-    transfer_videos(enable_notifications=True)
+    try:
+        run(profiler, manifest, args.streaming)
+    finally:
+        if args.profile and args.profile_upload:
+            upload_profiles(profiler)
+
+def run(profiler, manifest, streaming=False):
+    # Videos that could not be prepared for transfer; retrying the transfers cannot fix them
+    dropped_count = 0
+    if streaming:
+        # Steps 1 and 2 overlapped: every video is transferred as soon as its metadata is ready
+        print("Starting streaming pipeline...")
+        tracker = ProgressTracker(0, 0.0)
+        pipeline = StreamingPipeline(tracker)
+        with profiler.stage("transfer"):
+            pipeline.run()
+        dropped_count = len(pipeline.dropped)
+    else:
+        tracker = prepare_and_transfer(profiler, manifest)
+        if tracker is None:
+            return
+    video_count = tracker.total_videos
 
     # Step 3: Verify completion and retry failed videos
     while True:
-        completed_videos = count_completed_videos_in_dynamodb()
-        print(f"Completed videos: {completed_videos}/{video_count}")
+        print(tracker.summary())
 
-        # Log completed video count to local file and upload to S3
-        with open(COMPLETED_LOG_FILENAME, "a") as log_file:
-            log_message = f"Completed videos: {completed_videos}/{video_count} - {get_melbourne_time()}\n"
-            log_file.write(log_message)
+        # Log completed video count, rate and ETA to local file
+        log_progress(tracker)
 
         print(f"Progress logged. Check completed video count log in S3 for details.")
 
-        if completed_videos == video_count:
+        if tracker.is_complete:
             print("All videos transferred successfully.")
             send_sns_notification(f"Total {video_count} videos transferred successfully.")
             send_sqs_notification("Success", enable_notification=True)  # Send SQS notification on success
@@ -64,14 +93,126 @@ def main():
             # Final step: Upload completed log to S3 after all transfers are done
             upload_log_to_s3(COMPLETED_LOG_FILENAME, log_type="completed")
             print(f"Final completed video count uploaded to S3: {COMPLETED_LOG_FILENAME}")
+
+            # The next run is a new migration and starts from the beginning
+            manifest.reset()
+            if STATUS_JOURNAL_ENABLED:
+                STATUS_JOURNAL.flush()
+                STATUS_JOURNAL.clear_flushed()
+            break
+
+        elif tracker.completed_videos + dropped_count >= tracker.total_videos:
+            print(f"{dropped_count} videos could not be prepared for transfer (see the SNS notification), "
+                  f"run again to retry them.")
+            send_sqs_notification("Failure", enable_notification=True)
             break
 
         else:
             print("Retrying failed videos...")
-            retry_failed_videos()
+            with profiler.stage("transfer"):
+                retry_failed_videos(tracker)
     
     # Final status message
     print("Workflow completed.")
 
+def prepare_and_transfer(profiler, manifest):
+    """
+    Prepare the metadata (see prepare_metadata), then transfer the pending videos.
+
+    Returns:
+        ProgressTracker: Progress of the transfer, or None if no metadata could be fetched.
+    """
+    if not prepare_metadata(profiler, manifest):
+        return None
+
+    # Step 2: Start video transfer process; the metadata dicts of step 1 are gone by now
+    print("Starting video transfer process...")
+    tracker = build_tracker(FINAL_METADATA_LOCAL_PATH)
+    with profiler.stage("transfer"):
+        transfer_videos(enable_notifications=True, tracker=tracker)
+
+    return tracker
+
+def prepare_metadata(profiler, manifest):
+    """
+    Run the metadata stages one after another, up to the DynamoDB load.
+    Each stage is checkpointed in the manifest and skipped on a restart while its inputs are unchanged.
+
+    Returns:
+        bool: True if the final metadata was prepared, False if no metadata could be fetched.
+    """
+    # Step 1: Fetch and prepare metadata
+    with profiler.stage("metadata"):
+        print("Fetching metadata...")
+        metadata = manifest.run("crawl", [], fetch_all_metadata, check=bool)
+        if not metadata:
+            print("No metadata fetched, stopping.")
+            return False
+
+        print("Matching metadata against API results...")
+        matched_metadata, matched_video_ids = manifest.run(
+            "match", [manifest.output_hash("crawl")], lambda: fetch_all_docs_and_match(metadata),
+            check=lambda result: bool(result[0])
+        )
+
+        print("Get the lesson ID for all videos...")
+        object_key = manifest.run(
+            "object_keys", [manifest.output_hash("match")], lambda: generate_object_keys(matched_video_ids),
+            check=bool
+        )
+
+    with profiler.stage("json"):
+        print("Saving metadata to local file...")
+        metadata_file = save_metadata_to_file(matched_metadata, METADATA_LOCAL_PATH, object_key)
+
+        print("Counting videos in metadata...")
+        video_count = count_videos_in_file(metadata_file)
+
+    with profiler.stage("metadata"):
+        def fetch_final_urls():
+            started = time.time()
+            print("Appending file URLs to metadata...")
+            append_file_urls_to_metadata(METADATA_LOCAL_PATH, video_count)
+
+            print("Creating final download URLs...")
+            update_video_metadata_with_final_urls(METADATA_LOCAL_PATH, FINAL_METADATA_LOCAL_PATH)
+            # The final metadata file is only rewritten when the step succeeded
+            return os.path.exists(FINAL_METADATA_LOCAL_PATH) and os.path.getmtime(FINAL_METADATA_LOCAL_PATH) >= started
+
+        # The final URLs are signed and expire, so this checkpoint (and the DynamoDB load that
+        # copies the URLs) is only reused for CHECKPOINT_URL_MAX_AGE_HOURS
+        manifest.run("final_urls", [file_sha256(METADATA_LOCAL_PATH)], fetch_final_urls,
+                     files=[FINAL_METADATA_LOCAL_PATH], check=bool, max_age_hours=CHECKPOINT_URL_MAX_AGE_HOURS)
+
+    with profiler.stage("json"):
+        def save_snapshot():
+            print("Loading final metadata...")
+            with open(FINAL_METADATA_LOCAL_PATH, "r", encoding="utf-8") as f:
+                save_metadata_to_s3(json.load(f))
+
+        print("Saving metadata to S3...")
+        manifest.run("s3_snapshot", [manifest.output_hash("final_urls")], save_snapshot)
+
+    with profiler.stage("dynamodb"):
+        print("Uploading metadata to DynamoDB...")
+        manifest.run("dynamodb", [manifest.output_hash("final_urls")],
+                     lambda: upload_metadata_to_dynamodb(FINAL_METADATA_LOCAL_PATH), check=bool,
+                     max_age_hours=CHECKPOINT_URL_MAX_AGE_HOURS)
+        print("Metadata upload to DynamoDB completed.")
+
+    return True
+
+def build_tracker(final_metadata_path):
+    """
+    Progress tracker over the videos of the final metadata file, totalled from VideoRecords so
+    the full metadata dict is not kept for the transfer. Videos already completed in DynamoDB
+    (which the load leaves untouched) or in the status journal count as done.
+    """
+    records = load_video_records(final_metadata_path)
+    completed_ids = get_completed_video_ids()
+    completed = [record for record in records if record.video_id in completed_ids]
+    return ProgressTracker(len(records), sum(record.size_mb for record in records),
+                           len(completed), sum(record.size_mb for record in completed))
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
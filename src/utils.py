@@ -1,27 +1,45 @@
 import json
 import time
-import re
 import os
 import sys
+import math
+import gzip
+import hashlib
+import tempfile
+import threading
+import atexit
 import requests
+from urllib.parse import urlencode
 from datetime import datetime, timedelta, timezone
 from constants import *
 from config import *
+from metrics import TRANSFER_METRICS
+from progress import ProgressTracker
+from records import VideoRecord
+from scheduler import PriorityScheduler
+from endpoints import ENDPOINT_SELECTOR, is_host_failure
+from status_journal import StatusJournal
+from prepare import assign_unique_titles, build_tags, dynamodb_item, prepare_catalogue
 import logging
 from aliyunsdkvod.request.v20170321 import GetVideoListRequest
 from aliyunsdkvod.request.v20170321 import GetMezzanineInfoRequest
 from botocore.exceptions import BotoCoreError, ClientError
+from boto3.s3.transfer import TransferConfig
 
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def transfer_videos(enable_notifications=True):
+def transfer_videos(enable_notifications=True, tracker=None, scheduler=None):
     """
     Transfer videos with pending status and retry failed ones.
-    Sends SNS notifications at 10% increments and SQS notification upon completion or failure.
+    Sends SNS notifications at 10% (byte-weighted) increments with rate and ETA,
+    and SQS notification upon completion or failure.
     Logs failed transfers in real time to S3.
+    Progress is recorded on `tracker` (built from the pending videos if not given).
+    With `scheduler` (a streaming PriorityScheduler fed by pipeline.py) the videos are taken from
+    it until it is closed, instead of from DynamoDB and the final metadata file.
     Returns True if all videos are successfully transferred; False otherwise.
     """
 
@@ -29,29 +47,33 @@ def transfer_videos(enable_notifications=True):
         log_file.write("Failed Videos Log\n")
         log_file.write("=================\n")
 
-    # Open the file with utf-8 encoding
-    with open(FINAL_METADATA_LOCAL_PATH, "r", encoding="utf-8") as f:
-        updated_metadata = json.load(f)
-
-    # Save the metadata to S3, this will ensure Chinese characters are preserved in the final output
-    save_metadata_to_s3(updated_metadata)
-
-    # get the pending videos from DynamoDB
-    pending_videos = get_pending_videos()
+    if scheduler is None:
+        # Save the metadata to S3, this will ensure Chinese characters are preserved in the final output.
+        # The full metadata dict is only needed for the snapshot, not kept for the transfer.
+        with open(FINAL_METADATA_LOCAL_PATH, "r", encoding="utf-8") as f:
+            save_metadata_to_s3(json.load(f))
+
+        # get the pending videos from DynamoDB and queue them by priority lane
+        pending_videos = get_pending_videos()
+        scheduler = PriorityScheduler()
+        scheduler.add_all(pending_videos)
+        if tracker is None:
+            tracker = ProgressTracker.from_records(pending_videos)
+    elif tracker is None:
+        tracker = ProgressTracker(0, 0.0)
     failed_videos = []
     retries = {}
     retry_limit = 5
-    total_videos = len(pending_videos)
-    completed_videos = 0
-    progress_threshold = 10  # Start at 10%
+    progress = {"threshold": 10}  # Start at 10%
+    state_lock = threading.Lock()
 
     # Notify that video transfer has started
     send_sns_notification(percentage=0)  # Notify the start of the process
 
-    for video in pending_videos:
-        video_path = video['video_id']['S']
-        download_url = video['FinalDownloadURL']['S']
-        object_key = video.get("ObjectKey", {}).get("S", "")
+    def transfer_one(video):
+        video_path = video.video_id
+        download_url = video.download_url
+        object_key = video.object_key
 
         # Track the start time of the transfer
         start_time = time.time()
@@ -64,52 +86,89 @@ def transfer_videos(enable_notifications=True):
         # Calculate transfer time
         transfer_time = f"{round(end_time - start_time, 2)}"
 
+        # Per-stage timings and bytes recorded by download_and_transfer_video
+        video_metrics = TRANSFER_METRICS.pop_video(video_path)
+
         if success:
-            completed_videos += 1
-            update_video_status(video_path, 'completed', transfer_time)
+            tracker.record_completed(video.size_mb)
+            TRANSFER_METRICS.inc("videos_completed_total")
+            update_video_status(video_path, 'completed', transfer_time,
+                                video_metrics["stages"], video_metrics["bytes"], video.retry_count, video)
             print(f"Transfer of video {video_path} completed successfully.")
 
         else:
-            update_video_status(video_path, 'failed', transfer_time)
+            TRANSFER_METRICS.inc("videos_failed_total")
+            update_video_status(video_path, 'failed', transfer_time,
+                                video_metrics["stages"], video_metrics["bytes"], video.retry_count, video)
             print(f"Transfer of video {video_path} failed.")
 
             # Send SNS notification for failure
             send_sns_notification(failed_video_id=video_path)
 
-            retries[video_path] = retries.get(video_path, 0) + 1
-            if retries[video_path] > retry_limit:
-                failed_videos.append(video)
+            with state_lock:
+                retries[video_path] = retries.get(video_path, 0) + 1
+                if retries[video_path] > retry_limit:
+                    failed_videos.append(video)
 
-            # Log failure to local file and upload to S3
-            with open(FAILED_LOG_FILENAME, "a") as log_file:
-                log_message = f"Video {video_path} failed to transfer after {transfer_time}\n"
-                log_file.write(log_message)
-            upload_log_to_s3(FAILED_LOG_FILENAME, log_type="failed")
+                # Log failure to local file and upload to S3
+                with open(FAILED_LOG_FILENAME, "a") as log_file:
+                    log_message = f"Video {video_path} failed to transfer after {transfer_time}\n"
+                    log_file.write(log_message)
+                upload_log_to_s3(FAILED_LOG_FILENAME, log_type="failed")
             print(f"Video {video_path} failed to transfer. Check log in S3 for details.")
 
+        # Calculate progress (byte-weighted)
+        percentage = int(tracker.percentage)
 
-        # Calculate progress
-        progress = int((completed_videos / total_videos) * 100)
+        # Send SNS notification at every 10% increment and log the rate and ETA
+        with state_lock:
+            if tracker.totals_known and percentage >= progress["threshold"]:
+                send_sns_notification(percentage, detail=tracker.summary())
+                log_progress(tracker)
+                progress["threshold"] = (percentage // 10 + 1) * 10
 
-        # Send SNS notification at every 10% increment
-        if progress >= progress_threshold:
-            send_sns_notification(progress)
-            progress_threshold += 10
+        # Refresh the Prometheus textfile / JSON metrics snapshot
+        TRANSFER_METRICS.maybe_export()
 
-        # Simulate delay (optional)
-        time.sleep(0.5)  # Simulate delay for each video transfer
+    def worker(fast_lane):
+        while True:
+            video = scheduler.next(fast_lane=fast_lane)
+            if video is None:
+                break
+            try:
+                transfer_one(video)
+            except Exception as e:
+                print(f"Unexpected error transferring video {video.video_id}: {e}")
+            finally:
+                scheduler.task_done(video.video_id)
+
+            # Simulate delay (optional)
+            time.sleep(TRANSFER_PACING_SECONDS)  # Simulate delay for each video transfer
+
+    # TRANSFER_CONCURRENCY workers, FAST_LANE_WORKERS of them reserved for urgent videos
+    fast_lane_workers = min(FAST_LANE_WORKERS, TRANSFER_CONCURRENCY - 1)
+    workers = [
+        threading.Thread(target=worker, args=(index < fast_lane_workers,), name=f"transfer-{index}")
+        for index in range(TRANSFER_CONCURRENCY)
+    ]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
 
     # Retry failed videos
     for video in failed_videos[:]:
-        video_path = video['video_id']['S']
-        download_url = video['FinalDownloadURL']['S']
-        object_key = video.get("ObjectKey", {}).get("S", "")
+        video_path = video.video_id
+        download_url = video.download_url
+        object_key = video.object_key
 
         if video_path not in retries:
             retries[video_path] = 0  # Initialize retries for this video
 
         while retries[video_path] <= retry_limit:
             print(f"Retrying video: {video_path}")
+            TRANSFER_METRICS.inc("transfer_retries_total")
+            video.retry_count += 1
 
             # Track start and end times for retries
             start_time = time.time()
@@ -118,11 +177,14 @@ def transfer_videos(enable_notifications=True):
 
             # Calculate transfer time
             transfer_time = f"{round(end_time - start_time, 2)}"
+            video_metrics = TRANSFER_METRICS.pop_video(video_path)
 
             if success:
-                completed_videos += 1
+                tracker.record_completed(video.size_mb)
                 failed_videos.remove(video)  # Remove from failed_videos on success
-                update_video_status(video_path, 'completed', transfer_time)
+                TRANSFER_METRICS.inc("videos_completed_total")
+                update_video_status(video_path, 'completed', transfer_time,
+                                    video_metrics["stages"], video_metrics["bytes"], video.retry_count, video)
                 break
 
             retries[video_path] += 1
@@ -138,6 +200,13 @@ def transfer_videos(enable_notifications=True):
             upload_log_to_s3(FAILED_LOG_FILENAME, log_type="failed")
             print(f"Video {video_path} failed to transfer. Check log in S3 for details.")
 
+    # Write the journaled statuses, final metrics export and progress line for this run
+    if STATUS_JOURNAL_ENABLED:
+        STATUS_JOURNAL.flush()
+    TRANSFER_METRICS.export()
+    log_progress(tracker)
+    return not failed_videos
+
 
 def fetch_metadata_batch(page_no, page_size, sort_by="CreationTime", start_time=None, end_time=None):
     """Fetch metadata in batches with optional sorting and time range filtering."""
@@ -231,7 +300,7 @@ def fetch_all_metadata():
 
     # Wait for a while to ensure no new videos are uploaded
     print("Waiting for new uploads to finish...")
-    time.sleep(10)
+    time.sleep(METADATA_SETTLE_SECONDS)
 
     # Fetch the remaining metadata
     print("Fetching the remaining metadata...")
@@ -314,45 +383,8 @@ def save_metadata_to_file(metadata, file_path, object_keys):
         str: The path to the saved file.
     """
     try:
-        # A dictionary to track duplicate titles
-        title_tracker = {}
-
-        # Iterate over each video ID and its details
-        for video_id, video in metadata.items():
-            # Extract title, creation time, and initialize ordering number
-            video_title = video.get("Title", "untitled")
-            creation_time = video.get("CreateTime", "unknown")
-
-            # Replace all spaces, dashes, colons, and other special characters with underscores
-            cleaned_title = re.sub(r"[^a-zA-Z0-9\u4e00-\u9fff]+", "_", video_title)
-
-            # Format creation time for readability and replace special characters with underscores
-            try:
-                formatted_creation_time = datetime.strptime(creation_time, '%Y-%m-%d %H:%M:%S').strftime('%Y_%m_%dT%H_%M_%S')
-            except ValueError:
-                formatted_creation_time = re.sub(r"[^a-zA-Z0-9]+", "_", creation_time)
-
-            # Construct the base key
-            base_key = f"{cleaned_title}_{formatted_creation_time}"
-
-            # Resolve duplicates by adding an ordering number
-            if base_key in title_tracker:
-                title_tracker[base_key] += 1
-                unique_key = f"{base_key}_{title_tracker[base_key]}"
-            else:
-                title_tracker[base_key] = 1
-                unique_key = base_key
-
-            # Update the unique title in the metadata
-            video["unique_title"] = unique_key + ".mp4"  # Append .mp4 for clarity
-
-            # Add the object key if available
-            object_key = object_keys.get(video_id)
-            if object_key:
-                video["object_key"] = object_key
-
-            # Ensure the metadata is updated
-            metadata[video_id] = video
+        # Unique titles and object keys for the whole catalogue in one pass
+        assign_unique_titles(metadata, object_keys)
 
         # Save the updated metadata to the file
         with open(file_path, "w", encoding="utf-8") as file:
@@ -382,36 +414,122 @@ def count_videos_in_file(file_path):
         print(f"Error reading metadata file: {e}")
         sys.exit(1)
 
+def load_video_records(file_path):
+    """
+    Load a (final) metadata file as VideoRecords.
+
+    Returns:
+        list: One VideoRecord per video, in file order.
+    """
+    with open(file_path, "r", encoding="utf-8") as file:
+        return [VideoRecord.from_aliyun(video_id, video) for video_id, video in json.load(file).items()]
+
+def iter_metadata_json(metadata):
+    """
+    Yield the JSON text of `metadata` (the same text as json.dumps(metadata, ensure_ascii=False))
+    one video at a time, so each video is encoded by the C encoder instead of json.dump's
+    pure-Python token stream.
+    """
+    separator = "{"
+    for video_id, video in metadata.items():
+        yield f"{separator}{json.dumps(video_id, ensure_ascii=False)}: {json.dumps(video, ensure_ascii=False)}"
+        separator = ", "
+    yield "{}" if separator == "{" else "}"
+
+class MetadataSnapshotWriter:
+    """
+    Sink for the snapshot's JSON text: hashes it and gzips it into `fileobj`, buffering the
+    written text up to METADATA_WRITE_BUFFER_BYTES so hashing and compression run on large chunks.
+    """
+
+    def __init__(self, fileobj):
+        self.sha256 = hashlib.sha256()
+        self.gzip_file = gzip.GzipFile(fileobj=fileobj, mode="wb", compresslevel=METADATA_GZIP_LEVEL, mtime=0)
+        self.buffer = []
+        self.buffered = 0
+
+    def write(self, text):
+        self.buffer.append(text)
+        self.buffered += len(text)
+        if self.buffered >= METADATA_WRITE_BUFFER_BYTES:
+            self.flush()
+
+    def flush(self):
+        data = "".join(self.buffer).encode("utf-8")
+        self.buffer = []
+        self.buffered = 0
+        self.sha256.update(data)
+        self.gzip_file.write(data)
+
+    def close(self):
+        self.flush()
+        self.gzip_file.close()
+        return self.sha256.hexdigest()
+
+def get_s3_metadata_hash():
+    """Return the content hash stored on the current S3 metadata snapshot, or None if there is none."""
+    try:
+        response = s3_client.head_object(Bucket=AWS_LOG_BUCKET, Key=S3_METADATA_PATH)
+        return response.get("Metadata", {}).get("content-sha256")
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+
 def save_metadata_to_s3(metadata):
-    """Save metadata to S3 as a JSON file with proper encoding for Chinese characters."""
+    """
+    Save metadata to S3 as a gzip-compressed JSON snapshot with proper encoding for Chinese characters.
+    The snapshot is streamed through a spooled temp file (multipart upload when large) and skipped
+    when its content hash matches the snapshot already in S3.
+    """
     try:
-        # Use json.dumps with ensure_ascii=False to preserve Chinese characters
-        s3_client.put_object(
-            Bucket=AWS_LOG_BUCKET,
-            Key=S3_METADATA_PATH,
-            Body=json.dumps(metadata, ensure_ascii=False),  # Preserve Chinese characters
-            ContentType='application/json'
-        )
-        print(f"Metadata successfully uploaded to S3: {S3_METADATA_PATH}")
+        with tempfile.SpooledTemporaryFile(max_size=METADATA_SPOOL_MAX_MB * 1024 * 1024) as snapshot:
+            # JSON with ensure_ascii=False to preserve Chinese characters, encoded video by video
+            writer = MetadataSnapshotWriter(snapshot)
+            for text in iter_metadata_json(metadata):
+                writer.write(text)
+            content_hash = writer.close()
+
+            if get_s3_metadata_hash() == content_hash:
+                print(f"Metadata unchanged (sha256 {content_hash[:12]}), skipping upload to S3: {S3_METADATA_PATH}")
+                return
+
+            compressed_size = snapshot.tell()
+            snapshot.seek(0)
+            s3_client.upload_fileobj(
+                snapshot,
+                AWS_LOG_BUCKET,
+                S3_METADATA_PATH,
+                ExtraArgs={
+                    "ContentType": "application/json",
+                    "ContentEncoding": "gzip",
+                    "Metadata": {"content-sha256": content_hash},
+                },
+                Config=choose_upload_config(compressed_size) or TransferConfig()
+            )
+        print(f"Metadata successfully uploaded to S3: {S3_METADATA_PATH} ({compressed_size} bytes gzip)")
     except Exception as e:
         print(f"Error uploading metadata to S3: {e}")
         sys.exit(1)
 
-def fetch_mezzanine_info(video_id):
-    """Fetch the mezzanine information for a video using its VideoId."""
+def fetch_mezzanine_details(video_id):
+    """Fetch the mezzanine (source file) details for a video: FileURL, Size, CRC64/ETag, ..."""
     request = GetMezzanineInfoRequest.GetMezzanineInfoRequest()
     request.set_VideoId(video_id)
-    request.set_AuthTimeout(7200)  # Set timeout for URL validity (optional)
+    request.set_AuthTimeout(MEZZANINE_AUTH_TIMEOUT_SECONDS)  # Set timeout for URL validity (optional)
 
     try:
         response = Ali_client.do_action_with_exception(request)
         response_dict = json.loads(response)
-        file_url = response_dict.get("Mezzanine", {}).get("FileURL")
-        return file_url
+        return response_dict.get("Mezzanine", {})
     
     except Exception as e:
         print(f"Error fetching mezzanine info for VideoId {video_id}: {e}")
-        return None
+        return {}
+
+def fetch_mezzanine_info(video_id):
+    """Fetch the mezzanine information for a video using its VideoId."""
+    return fetch_mezzanine_details(video_id).get("FileURL")
 
 def append_file_urls_to_metadata(file_path, total_metadata_count):
     """
@@ -434,9 +552,13 @@ def append_file_urls_to_metadata(file_path, total_metadata_count):
 
         # Update each video with its file URL
         for index, (video_id, video_metadata) in enumerate(metadata.items(), start=1):
-            file_url = fetch_mezzanine_info(video_id)
+            mezzanine = fetch_mezzanine_details(video_id)
+            file_url = mezzanine.get("FileURL")
             if file_url:
                 video_metadata["FileURL"] = file_url
+                # Source identity for content-level deduplication
+                video_metadata["SourceSize"] = mezzanine.get("Size", video_metadata.get("Size", 0))
+                video_metadata["SourceChecksum"] = mezzanine.get("CRC64") or mezzanine.get("ETag") or ""
                 appended_count += 1
                 print(f"Appended {appended_count}/{total_metadata_count} FileURL {file_url} for VideoId {video_id}.")
             else:
@@ -474,6 +596,25 @@ def append_file_urls_to_metadata(file_path, total_metadata_count):
         print("Error decoding JSON file.")
         send_sns_notification(subject="Metadata Update Failed", message="Error: Failed to decode metadata JSON file.")
 
+def generate_final_download_url(file_url, storage_location):
+    """
+    Generate the final download URL.
+
+    Args:
+        file_url (str): The original FileURL from the metadata.
+        storage_location (str): The StorageLocation from the metadata.
+
+    Returns:
+        str: The final download URL.
+    """
+    if not file_url or not storage_location:
+        raise ValueError("Both 'FileURL' and 'StorageLocation' must be provided.")
+
+    # Extract the relative path from the FileURL
+    relative_path = "/".join(file_url.split("/")[3:])
+    # Construct the final URL
+    return f"https://{storage_location}/{relative_path}"
+
 def update_video_metadata_with_final_urls(metadata_file, output_file):
     """
     Update video metadata with final download URLs and save to a new file.
@@ -482,25 +623,6 @@ def update_video_metadata_with_final_urls(metadata_file, output_file):
         metadata_file (str): Path to the JSON file containing video metadata.
         output_file (str): Path to save the updated metadata with final download URLs.
     """
-    def generate_final_download_url(file_url, storage_location):
-        """
-        Generate the final download URL.
-
-        Args:
-            file_url (str): The original FileURL from the metadata.
-            storage_location (str): The StorageLocation from the metadata.
-
-        Returns:
-            str: The final download URL.
-        """
-        if not file_url or not storage_location:
-            raise ValueError("Both 'FileURL' and 'StorageLocation' must be provided.")
-        
-        # Extract the relative path from the FileURL
-        relative_path = "/".join(file_url.split("/")[3:])
-        # Construct the final URL
-        return f"https://{storage_location}/{relative_path}"
-
     try:
         # Load the metadata from the file
         with open(metadata_file, "r", encoding="utf-8") as f:
@@ -515,6 +637,9 @@ def update_video_metadata_with_final_urls(metadata_file, output_file):
             except ValueError as e:
                 print(f"Skipping video {video_id}: {e}")
 
+        # Mark later copies of the same source file so they are copied inside S3
+        mark_duplicate_videos(metadata)
+
         # Save the updated metadata to the output file
         with open(output_file, "w", encoding="utf-8") as f:
             json.dump(metadata, f, ensure_ascii=False, indent=2)
@@ -524,93 +649,161 @@ def update_video_metadata_with_final_urls(metadata_file, output_file):
     except Exception as e:
         print(f"An error occurred: {e}")
 
+def source_identity(video):
+    """
+    Identity of a video's source file: its size plus the Aliyun checksum (CRC64/ETag) when known,
+    otherwise its size, duration and title. Returns None when the size is unknown.
+    """
+    size = video.get("SourceSize") or video.get("Size")
+    if not size:
+        return None
+    checksum = video.get("SourceChecksum")
+    if checksum:
+        return ("checksum", size, checksum)
+    return ("size_duration_title", size, video.get("Duration"), video.get("Title"))
+
+def mark_duplicate_videos(metadata):
+    """
+    Build the dedup index of the metadata in place: the first video with a given source
+    identity is transferred normally, each later one gets DuplicateOf / DuplicateSourceKey
+    pointing at it so it can be created with an S3 copy instead of another download.
+
+    Returns:
+        int: The number of duplicates marked.
+    """
+    dedup_index = {}
+    duplicates = 0
+    for video_id, video in metadata.items():
+        identity = source_identity(video)
+        if identity is None or not video.get("object_key"):
+            continue
+
+        primary_id = dedup_index.setdefault(identity, video_id)
+        if primary_id != video_id:
+            video["DuplicateOf"] = primary_id
+            video["DuplicateSourceKey"] = metadata[primary_id]["object_key"]
+            duplicates += 1
+        else:
+            video.pop("DuplicateOf", None)
+            video.pop("DuplicateSourceKey", None)
+
+    print(f"Deduplication: {duplicates} duplicate videos will be copied within S3.")
+    return duplicates
+
+def put_video_item(video_id, item):
+    """
+    Put a video's DynamoDB item, leaving a video already marked completed untouched.
+
+    Returns:
+        bool: True if the item was written, False if the video was already completed.
+    """
+    try:
+        dynamodb_client.put_item(
+            TableName=DYNAMODB_TABLE,
+            Item=item,
+            ConditionExpression="attribute_not_exists(video_id) OR #Transfer_Status <> :completed",
+            ExpressionAttributeNames={"#Transfer_Status": "Transfer_Status"},
+            ExpressionAttributeValues={":completed": {"S": "completed"}}
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        print(f"Video {video_id} already completed, keeping its status.")
+        return False
+    return True
+
+def register_video(video_id, video_data):
+    """Put one video into DynamoDB with initial transfer status (see prepare.dynamodb_item and put_video_item)."""
+    return put_video_item(video_id, dynamodb_item(video_id, video_data))
+
 def upload_metadata_to_dynamodb(local_file_path):
-    """Upload metadata to DynamoDB with initial transfer status, converting size to MB and duration to h:m:s format."""
-    
-    def bytes_to_mb(bytes_size):
-        """Convert bytes to MB with 2 decimal places."""
-        return round(bytes_size / (1024 * 1024), 2)
-
-    def seconds_to_hms(seconds):
-        """Convert seconds to h:m:s format."""
-        hours = seconds // 3600
-        minutes = (seconds % 3600) // 60
-        seconds = seconds % 60
-        return f"{hours:02}:{minutes:02}:{seconds:02}"
+    """
+    Upload metadata to DynamoDB with initial transfer status, converting size to MB and duration to h:m:s format.
+    Items of videos already marked completed are left untouched, so the load can be re-run safely.
+    Returns True if the load finished, False on an error.
+    """
     try: 
         # Load metadata from JSON file
         with open(local_file_path, "r", encoding="utf-8") as file:
             metadata = json.load(file)
 
-        for video_id, video_data in metadata.items():
-            # Convert size to MB and duration to h:m:s format
-            size_mb = bytes_to_mb(video_data.get("Size", 0))
-            duration_hms = seconds_to_hms(video_data.get("Duration", 0))
-
-            # Prepare the item for DynamoDB
-            snapshots = video_data.get("Snapshots", {}).get("Snapshot", [])
-            snapshots_json = json.dumps(snapshots)  # Serialize Snapshots array
-            
-            # Include the object key from metadata
-            object_key = video_data.get("object_key", "")
-
-            # Prepare item for DynamoDB
-            item = {
-                "video_id": {"S": video_id},                             # Outer key as primary key
-                "Transfer_Status": {"S": "pending"},                     # Default status
-                "Transfer_Time": {"N": "0"},                             # Default transfer time (seconds)
-                "FileURL": {"S": video_data.get("FileURL", "")},         # Video file URL
-                "FinalDownloadURL": {"S": video_data.get("FinalDownloadURL", "")},           # Final download URL from metadata
-                "Title": {"S": video_data.get("Title", "")},             # Video title
-                "unique_title": {"S": video_data.get("unique_title", "")},  # Unique title field
-                "Size_MB": {"N": str(size_mb)},                          # File size in MB
-                "Duration_HMS": {"S": duration_hms},                     # Duration in h:m:s format
-                "CateId": {"N": str(video_data.get("CateId", 0))},       # Category ID
-                "CateName": {"S": video_data.get("CateName", "")},       # Category name
-                "AppId": {"S": video_data.get("AppId", "")},             # Application ID
-                "Status": {"S": video_data.get("Status", "")},           # Video status
-                "ModifyTime": {"S": video_data.get("ModifyTime", "")},   # Last modified time
-                "CreateTime": {"S": video_data.get("CreateTime", "")},   # Creation time
-                "CoverURL": {"S": video_data.get("CoverURL", "")},       # Cover image URL
-                "Snapshots": {"S": snapshots_json},                      # Snapshots (JSON string)
-                "StorageLocation": {"S": video_data.get("StorageLocation", "")},  # Storage location
-                "ObjectKey": {"S": object_key},                          # Object key
-            }
+        # Items for the whole catalogue are built in one pass before writing
+        for prepared in prepare_catalogue(metadata):
+            if put_video_item(prepared.video_id, prepared.item):
+                success_message = f"Uploaded metadata for video_id: {prepared.video_id}"
+                print(success_message)
 
-            # Add the item to DynamoDB
-            dynamodb_client.put_item(
-                TableName=DYNAMODB_TABLE,
-                Item=item
-            )
-            success_message = f"Uploaded metadata for video_id: {video_id}"
-            print(success_message)
+        return True
 
     except ClientError as e:
         error_message = f"ClientError: {e.response['Error']['Message']}"
         print(error_message)
+        return False
 
     except Exception as e:
         error_message = f"Unexpected error: {str(e)}"
         print(error_message)
+        return False
 
-def update_video_status(video_id, status, transfer_time=None):
-    """Update the status and transfer time of a video in DynamoDB."""
+def update_video_status(video_id, status, transfer_time=None, stage_times=None, bytes_transferred=None,
+                        retry_count=None, record=None):
+    """
+    Update the status and transfer time of a video.
+    With STATUS_JOURNAL_ENABLED the transition is journaled locally and written to DynamoDB in
+    batches by the write-behind flusher; `record` (a VideoRecord) lets failed videos be retried
+    from the journal. Otherwise DynamoDB is updated synchronously.
+    """
+    if STATUS_JOURNAL_ENABLED:
+        STATUS_JOURNAL.record(video_id, status, transfer_time, stage_times, bytes_transferred, retry_count, record)
+    else:
+        write_video_status(video_id, status, transfer_time, stage_times, bytes_transferred, retry_count)
+
+def write_video_status(video_id, status, transfer_time=None, stage_times=None, bytes_transferred=None, retry_count=None):
+    """
+    Update the status and transfer time of a video in DynamoDB.
+    Optionally stores the per-stage timing breakdown (seconds), bytes transferred and retry count.
+    """
     update_expression = 'SET #Transfer_Status = :status'
+    expression_attribute_names = {"#Transfer_Status": "Transfer_Status"}
     expression_attribute_values = {':status': {'S': status}}
 
     # Conditionally add transfer time update
     if transfer_time is not None:
         update_expression += ', #Transfer_Time = :transfer_time'
+        expression_attribute_names["#Transfer_Time"] = "Transfer_Time"
         expression_attribute_values[':transfer_time'] = {'N': str(transfer_time)}
 
+    # Conditionally add the stage breakdown, e.g. {"download": 12.3, "upload": 4.5, ...}
+    if stage_times:
+        update_expression += ', #Stage_Times = :stage_times'
+        expression_attribute_names["#Stage_Times"] = "Stage_Times"
+        expression_attribute_values[':stage_times'] = {
+            'M': {stage: {'N': str(seconds)} for stage, seconds in stage_times.items()}
+        }
+
+    if bytes_transferred is not None:
+        update_expression += ', #Bytes_Transferred = :bytes_transferred'
+        expression_attribute_names["#Bytes_Transferred"] = "Bytes_Transferred"
+        expression_attribute_values[':bytes_transferred'] = {'N': str(bytes_transferred)}
+
+    if retry_count is not None:
+        update_expression += ', #Retry_Count = :retry_count'
+        expression_attribute_names["#Retry_Count"] = "Retry_Count"
+        expression_attribute_values[':retry_count'] = {'N': str(retry_count)}
+
     # Update the item in DynamoDB
-    dynamodb_client.update_item(
-        TableName=DYNAMODB_TABLE,
-        Key={'video_id': {'S': video_id}},
-        UpdateExpression=update_expression,
-        ExpressionAttributeNames={"#Transfer_Status": "Transfer_Status", "#Transfer_Time": "Transfer_Time"},
-        ExpressionAttributeValues=expression_attribute_values
-    )
+    with TRANSFER_METRICS.time_stage(None, "status_update"):
+        dynamodb_client.update_item(
+            TableName=DYNAMODB_TABLE,
+            Key={'video_id': {'S': video_id}},
+            UpdateExpression=update_expression,
+            ExpressionAttributeNames=expression_attribute_names,
+            ExpressionAttributeValues=expression_attribute_values
+        )
+
+# Write-behind journal of status transitions, flushed to DynamoDB in the background
+STATUS_JOURNAL = StatusJournal(write_video_status, table=DYNAMODB_TABLE)
+atexit.register(STATUS_JOURNAL.stop)
 
 def generate_lesson_video_ids(video_id):
     """
@@ -721,39 +914,158 @@ def get_existing_video_info(video_id):
         logger.error(f"Error in get_existing_video_info: {str(e)}")
         return None, None
 
-def download_and_transfer_video(download_url, video_metadata, object_key, local_folder="/tmp"):
+def generate_object_keys(video_ids):
     """
-    Download a video from Ali VOD using its metadata, upload it to S3 with tagging, and clean up locally.
-    
+    Generate the S3 object key of every video through the lesson API.
+
     Args:
-        video_metadata (dict): Metadata of the video, including VideoId, Title, Size, and CreationTime.
-        local_folder (str): The local folder to temporarily store the downloaded video.
+        video_ids (list): Video IDs to look up.
 
     Returns:
-        bool: True if the video is successfully transferred to S3; False otherwise.
+        dict: video_id -> "lesson/lessonid/videoid" for the videos that have one.
+    """
+    object_keys = {}
+    for video_id in video_ids:
+        object_key = generate_lesson_video_ids(video_id)
+        # Lookups return None (or a (None, None) tuple) on errors
+        if isinstance(object_key, str):
+            object_keys[video_id] = object_key
+    print(f"Generated object keys for {len(object_keys)}/{len(video_ids)} videos.")
+    return object_keys
+
+def choose_upload_config(size_bytes):
     """
-    # Extract relevant metadata fields
-    video_id_raw = video_metadata.get("video_id", {"S": "unknown_id"})
-    video_id = video_id_raw.get("S", "unknown_id") if isinstance(video_id_raw, dict) else video_id_raw
+    Pick the S3 upload strategy for an object of `size_bytes`.
 
-    title_raw = video_metadata.get("Title", {"S": "Untitled"})
-    title = title_raw.get("S", "Untitled") if isinstance(title_raw, dict) else title_raw
+    Returns:
+        TransferConfig or None: None for a single PutObject request; otherwise a multipart
+        config whose part size keeps the upload within S3_MAX_PARTS and whose concurrency
+        fits this upload's share of S3_UPLOAD_BANDWIDTH_MB_PER_S (see s3_part_concurrency).
+    """
+    mb = 1024 * 1024
+    if size_bytes <= S3_SINGLE_PUT_MAX_MB * mb:
+        return None
 
-    size_raw = video_metadata.get("Size_MB", {"N": "0"})  # Assuming size may be numeric
-    size = float(size_raw.get("N", 0)) if isinstance(size_raw, dict) else float(size_raw)
+    # Grow the part size (in whole MB) until the object fits in S3_MAX_PARTS parts
+    chunk_mb = max(S3_MULTIPART_CHUNK_MB, S3_MIN_PART_MB, math.ceil(size_bytes / S3_MAX_PARTS / mb))
+    part_count = math.ceil(size_bytes / (chunk_mb * mb))
 
-    creation_time_raw = video_metadata.get("CreateTime", "1970-01-01T00:00:00Z")
-    if isinstance(creation_time_raw, dict):
-        creation_time_str = creation_time_raw.get("S", "1970-01-01T00:00:00Z")
-    else:
-        creation_time_str = creation_time_raw
-    creation_time = datetime.strptime(creation_time_str, "%Y-%m-%d %H:%M:%S")
+    # Enough parallel parts to fill this upload's share of the bandwidth, but never more than there are parts
+    concurrency = min(s3_part_concurrency(), part_count)
+
+    return TransferConfig(
+        multipart_threshold=S3_SINGLE_PUT_MAX_MB * mb,
+        multipart_chunksize=chunk_mb * mb,
+        max_concurrency=concurrency,
+    )
 
-    download_url_raw = video_metadata.get("FinalDownloadURL", "unknown_url")
-    if isinstance(download_url_raw, dict):  # Handle DynamoDB format
-        download_url = download_url_raw.get("S", "unknown_url")
+def upload_video_to_s3(local_file_path, s3_file_key, tags, size_bytes):
+    """
+    Upload a local video to AWS_VIDEO_BUCKET with its tags in the same request,
+    as a single PUT for small files and as a tuned multipart upload for large ones.
+    """
+    tagging = urlencode({tag["Key"]: tag["Value"] for tag in tags})
+    transfer_config = choose_upload_config(size_bytes)
+
+    if transfer_config is None:
+        with open(local_file_path, "rb") as video_file:
+            s3_client.put_object(
+                Bucket=AWS_VIDEO_BUCKET,
+                Key=s3_file_key,
+                Body=video_file,
+                Tagging=tagging
+            )
     else:
-        download_url = download_url_raw
+        s3_client.upload_file(
+            local_file_path,
+            AWS_VIDEO_BUCKET,
+            s3_file_key,
+            ExtraArgs={"Tagging": tagging},
+            Config=transfer_config
+        )
+
+def download_video(download_url, local_file_path):
+    """
+    Download a video to a local file from the fastest healthy host for its StorageLocation,
+    failing over to the next candidate host if a download fails.
+
+    Returns:
+        int: The number of bytes downloaded.
+    """
+    last_error = None
+    for url in ENDPOINT_SELECTOR.urls_for(download_url):
+        downloaded_bytes = 0
+        try:
+            with requests.get(url, stream=True,
+                              timeout=(DOWNLOAD_CONNECT_TIMEOUT_SECONDS, DOWNLOAD_READ_TIMEOUT_SECONDS)) as response:
+                response.raise_for_status()
+                with open(local_file_path, "wb") as video_file:
+                    for chunk in response.iter_content(chunk_size=8192):  # Stream in 8 KB chunks
+                        video_file.write(chunk)
+                        downloaded_bytes += len(chunk)
+            return downloaded_bytes
+        except requests.exceptions.RequestException as e:
+            print(f"Download from {url.split('?')[0]} failed: {e}")
+            if is_host_failure(e):
+                ENDPOINT_SELECTOR.mark_failed(url)
+            last_error = e
+    raise last_error
+
+def copy_duplicate_video(video, s3_file_key, tags):
+    """
+    Create a duplicate video's object with a server-side S3 copy of its original's object.
+
+    Returns:
+        bool: True if the copy succeeded; False if the original is not in S3 (yet) or the copy failed.
+    """
+    source_key = f"{video.duplicate_source_key}.mp4"
+    try:
+        with TRANSFER_METRICS.time_stage(video.video_id, "copy"):
+            source_size = s3_client.head_object(Bucket=AWS_VIDEO_BUCKET, Key=source_key)["ContentLength"]
+            copy_source = {"Bucket": AWS_VIDEO_BUCKET, "Key": source_key}
+            tagging = urlencode({tag["Key"]: tag["Value"] for tag in tags})
+
+            if source_size <= S3_COPY_OBJECT_MAX_MB * 1024 * 1024:
+                s3_client.copy_object(
+                    Bucket=AWS_VIDEO_BUCKET,
+                    Key=s3_file_key,
+                    CopySource=copy_source,
+                    TaggingDirective="REPLACE",
+                    Tagging=tagging
+                )
+            else:
+                # Objects over the CopyObject limit need a multipart copy, which doesn't carry tags
+                s3_client.copy(copy_source, AWS_VIDEO_BUCKET, s3_file_key, Config=choose_upload_config(source_size))
+                s3_client.put_object_tagging(Bucket=AWS_VIDEO_BUCKET, Key=s3_file_key, Tagging={"TagSet": tags})
+
+        TRANSFER_METRICS.inc("dedup_copies_total")
+        TRANSFER_METRICS.add_bytes(video.video_id, "copy", source_size)
+        print(f"Video '{video.video_id}' copied in S3 from duplicate '{video.duplicate_of}' ({source_key}).")
+        return True
+
+    except ClientError as e:
+        print(f"S3 copy of duplicate '{video.video_id}' from '{source_key}' failed, downloading instead: {e}")
+        return False
+
+def download_and_transfer_video(download_url, video_metadata, object_key, local_folder="/tmp"):
+    """
+    Download a video from Ali VOD using its metadata, upload it to S3 with tagging, and clean up locally.
+    
+    Args:
+        video_metadata (VideoRecord): The video to transfer (a DynamoDB item dict is converted once).
+        local_folder (str): The local folder to temporarily store the downloaded video.
+
+    Returns:
+        bool: True if the video is successfully transferred to S3; False otherwise.
+    """
+    if not isinstance(video_metadata, VideoRecord):
+        video_metadata = VideoRecord.from_dynamodb(video_metadata)
+
+    video_id = video_metadata.video_id
+    title = video_metadata.title
+    size = video_metadata.size_mb
+    creation_time_str = video_metadata.create_time
+    download_url = video_metadata.download_url or download_url
     
     file_extension = ".mp4"
 
@@ -763,59 +1075,34 @@ def download_and_transfer_video(download_url, video_metadata, object_key, local_
     local_file_path = os.path.join(local_folder, video_id)
 
     try:
+        # Tags for the S3 object, sanitized with the precomputed translation table
+        tags = build_tags(title, size, creation_time_str)
+
+        # Duplicates of an already transferred source file are copied within S3
+        if video_metadata.duplicate_of and copy_duplicate_video(video_metadata, s3_file_key, tags):
+            return True
+
         # Step 1: Download the video
         print(f"Downloading video '{video_id}' from Ali VOD...")
-        with requests.get(download_url, stream=True) as response:
-            response.raise_for_status()
-            with open(local_file_path, "wb") as video_file:
-                for chunk in response.iter_content(chunk_size=8192):  # Stream in 8 KB chunks
-                    video_file.write(chunk)
+        with TRANSFER_METRICS.time_stage(video_id, "download"):
+            downloaded_bytes = download_video(download_url, local_file_path)
+        TRANSFER_METRICS.add_bytes(video_id, "download", downloaded_bytes)
 
         print(f"Download complete for '{video_id}'.")
 
         # Step 2: Upload the video to S3 with tags
+        # Tags travel with the upload request itself, no separate put_object_tagging call
         print(f"Uploading video '{video_id}' to S3...")
-        s3_client.upload_file(
-            local_file_path,
-            AWS_VIDEO_BUCKET,
-            s3_file_key
-        )
-
-        # Add tags to the uploaded file
-        tags = [
-            {"Key": "Title", "Value": str(title)},
-            {"Key": "Size_MB", "Value": str(size)},
-            {"Key": "CreateTime", "Value": str(creation_time_str)},
-        ]
-
-        # Define invalid characters for S3 tag values
-        invalid_characters = "&<>\\"
-        control_characters = ''.join(chr(i) for i in range(32)) + chr(127)  # ASCII 0-31 and 127
-
-        # Combine all invalid characters
-        all_invalid_characters = set(invalid_characters + control_characters)
-
-        # Sanitize tag values
-        for tag in tags:
-            # Truncate tag values to a maximum of 128 characters
-            tag["Value"] = tag["Value"][:128]
-            
-            # Replace invalid characters with underscores
-            tag["Value"] = "".join(
-                char if char not in all_invalid_characters else "_" for char in tag["Value"]
-            ).strip()
-
-        s3_client.put_object_tagging(
-            Bucket=AWS_VIDEO_BUCKET,
-            Key=s3_file_key,
-            Tagging={"TagSet": tags}
-        )
+        with TRANSFER_METRICS.time_stage(video_id, "upload"):
+            upload_video_to_s3(local_file_path, s3_file_key, tags, downloaded_bytes)
+        TRANSFER_METRICS.add_bytes(video_id, "upload", downloaded_bytes)
         print(f"Video '{video_id}' successfully uploaded and tagged in S3.")
 
         # Step 3: Delete the local file
-        if os.path.exists(local_file_path):
-            os.remove(local_file_path)
-            print(f"Local file '{local_file_path}' deleted after upload.")
+        with TRANSFER_METRICS.time_stage(video_id, "cleanup"):
+            if os.path.exists(local_file_path):
+                os.remove(local_file_path)
+                print(f"Local file '{local_file_path}' deleted after upload.")
 
         return True
 
@@ -826,10 +1113,11 @@ def download_and_transfer_video(download_url, video_metadata, object_key, local_
         print(f"Error uploading video '{video_id}' to S3: {e}")
         return False
 
-def send_sns_notification(percentage=None, failed_video_id=None):
+def send_sns_notification(percentage=None, failed_video_id=None, detail=None):
     """
     Sends an SNS notification for progress percentage.
     If failed_video_id is provided, sends a failure notification.
+    `detail` (e.g. a ProgressTracker summary) is appended to the progress message.
     """
     if failed_video_id:
         # Send failure notification with video ID
@@ -845,6 +1133,8 @@ def send_sns_notification(percentage=None, failed_video_id=None):
         # Send progress notification
         subject = f"Video Transfer Progress: {percentage}% Complete"
         message = f"The video transfer process has reached {percentage}% completion."
+        if detail:
+            message += f"\n{detail}"
         sns_client.publish(
             TopicArn=SNS_TOPIC_ARN,
             Subject=subject,
@@ -866,15 +1156,42 @@ def send_sqs_notification(status, enable_notification=True):
     else:
         print(f"SQS Notification skipped: {status}")
 
-def get_pending_videos():
-    """Retrieve video metadata with 'pending' status from DynamoDB."""
-    response = dynamodb_client.scan(
+def get_videos_by_status(status):
+    """
+    Retrieve videos with the given transfer status from DynamoDB as VideoRecords.
+    Only the attributes the transfer needs are read, across all scan pages.
+    """
+    attribute_names = {f"#{name}": name for name in VideoRecord.DYNAMODB_ATTRIBUTES}
+    paginator = dynamodb_client.get_paginator("scan")
+    pages = paginator.paginate(
         TableName=DYNAMODB_TABLE,
-        FilterExpression="#Transfer_Status = :pending",
-        ExpressionAttributeNames={'#Transfer_Status': 'Transfer_Status'},
-        ExpressionAttributeValues={':pending': {'S': 'pending'}}
+        FilterExpression="#Transfer_Status = :status",
+        ProjectionExpression=", ".join(attribute_names),
+        ExpressionAttributeNames=attribute_names,
+        ExpressionAttributeValues={':status': {'S': status}}
     )
-    return response.get('Items', [])
+    return [VideoRecord.from_dynamodb(item) for page in pages for item in page.get('Items', [])]
+
+def get_completed_video_ids():
+    """
+    IDs of the videos completed in DynamoDB, with the status journal's unflushed transitions applied
+    (completions not written yet, or videos set back to pending since).
+    """
+    statuses = {video.video_id: "completed" for video in get_videos_by_status("completed")}
+    if STATUS_JOURNAL_ENABLED:
+        statuses.update(STATUS_JOURNAL.statuses())
+    return {video_id for video_id, status in statuses.items() if status == "completed"}
+
+def get_pending_videos():
+    """
+    Retrieve video metadata with 'pending' status from DynamoDB, leaving out videos the
+    status journal has as completed but not flushed yet (e.g. before a crash).
+    """
+    pending_videos = get_videos_by_status("pending")
+    if not STATUS_JOURNAL_ENABLED:
+        return pending_videos
+    journal_statuses = STATUS_JOURNAL.statuses()
+    return [video for video in pending_videos if journal_statuses.get(video.video_id) != "completed"]
 
 def upload_log_to_s3(log_file, log_type="failed"):
     """
@@ -883,8 +1200,6 @@ def upload_log_to_s3(log_file, log_type="failed"):
         log_file (str): Path to the log file.
         log_type (str): Type of log ("failed" or "completed"). Determines the S3 folder structure.
     """
-    s3_client = boto3.client("s3")
-    
     # Use different S3 folders for different log types
     s3_key = f"{LOG_FOLDER}/{log_type}/{os.path.basename(log_file)}"
     
@@ -894,6 +1209,11 @@ def upload_log_to_s3(log_file, log_type="failed"):
     except Exception as e:
         print(f"Failed to upload {log_type} log to S3: {e}")
 
+def log_progress(tracker):
+    """Append the tracker's progress summary to the completed video count log."""
+    with open(COMPLETED_LOG_FILENAME, "a") as log_file:
+        log_file.write(f"{tracker.summary()} - {get_melbourne_time()}\n")
+
 def count_completed_videos_in_dynamodb():
     """
     Count the number of videos with 'completed' status in DynamoDB.
@@ -905,34 +1225,46 @@ def count_completed_videos_in_dynamodb():
     )
     return len(response["Items"])
 
-def retry_failed_videos():
+def retry_failed_videos(tracker=None):
     """
     Retry transferring videos with 'failed' status in DynamoDB.
+    Successful retries are recorded on `tracker` if given.
     """
-    response = dynamodb_client.scan(
-        TableName=DYNAMODB_TABLE,
-        FilterExpression="Transfer_Status = :failed",
-        ExpressionAttributeValues={":failed": {"S": "failed"}}
-    )
-    failed_videos = response["Items"]
+    # Failed videos come from the local status journal when it is enabled
+    if STATUS_JOURNAL_ENABLED:
+        failed_videos = STATUS_JOURNAL.videos_with_status("failed")
+    else:
+        failed_videos = get_videos_by_status("failed")
     for video in failed_videos:
-        video_path = video["video_id"]["S"]
-        download_url = video["FinalDownloadURL"]["S"]
-        print(f"Retrying failed video: {video_path}")
-        transfer_failed_video(download_url, video, TEMP_VIDEO_LOCAL_PATH)
+        print(f"Retrying failed video: {video.video_id}")
+        transfer_failed_video(video.download_url, video, TEMP_VIDEO_LOCAL_PATH, tracker)
+
+    if STATUS_JOURNAL_ENABLED:
+        STATUS_JOURNAL.flush()
+
+    TRANSFER_METRICS.export()
 
-def transfer_failed_video(download_url, video, local_path):
+def transfer_failed_video(download_url, video, local_path, tracker=None):
     """
-    Transfer a single video.
+    Transfer a single video again; its retry count (from the journal or Retry_Count) goes up by one.
     """
-    success = download_and_transfer_video(download_url, video, local_path)
-    video_path = video["video_id"]["S"]
+    video.retry_count += 1
+    success = download_and_transfer_video(download_url, video, video.object_key, local_path)
+    video_path = video.video_id
+    video_metrics = TRANSFER_METRICS.pop_video(video_path)
+    TRANSFER_METRICS.inc("transfer_retries_total")
 
     if success:
-        update_video_status(video_path, "completed")
+        if tracker is not None:
+            tracker.record_completed(video.size_mb)
+        TRANSFER_METRICS.inc("videos_completed_total")
+        update_video_status(video_path, "completed", stage_times=video_metrics["stages"],
+                            bytes_transferred=video_metrics["bytes"], retry_count=video.retry_count, record=video)
         print(f"Video {video_path} transferred successfully.")
     else:
-        update_video_status(video_path, "failed")
+        TRANSFER_METRICS.inc("videos_failed_total")
+        update_video_status(video_path, "failed", stage_times=video_metrics["stages"],
+                            bytes_transferred=video_metrics["bytes"], retry_count=video.retry_count, record=video)
         print(f"Video {video_path} failed to transfer.")
 
 # Define Melbourne timezone